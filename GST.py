@@ -1,9 +1,44 @@
 import streamlit as st
-import fitz  # PyMuPDF
-import pdfplumber
-import re
+import os
+import time
+import zipfile
 import pandas as pd
 from pathlib import Path
+from gst_extractor import (
+    ArchiveMember,
+    FISCAL_MONTHS,
+    GSTR3B_SUMMARY_AMOUNTS,
+    MAX_WORKERS,
+    RECONCILIATION_KEYS,
+    RECONCILIATION_STATUSES,
+    TABLE_ENGINES,
+    ExtractionCache,
+    PerformanceLog,
+    ReturnStore,
+    SessionTables,
+    archive_members,
+    build_file_dimension,
+    content_digest,
+    parse_amount_columns,
+    parse_counts,
+    reconcile_returns,
+    create_combined_gstr3b_sheet,
+    default_memory_budget_mb,
+    default_table_engine,
+    default_worker_count,
+    gstr3b_summary_rows,
+    iter_extract_files,
+    page_count,
+    select_files,
+    slice_by_files,
+    summarize_returns,
+    table_page,
+    with_file_details,
+    write_csv_gzip_archive,
+    write_excel,
+    write_parquet_archive,
+    write_partitioned_archive,
+)
  
 # Set Streamlit page layout
 st.set_page_config(layout="wide")
@@ -38,660 +73,770 @@ else:
  
 # Add sidebar for GST type selection
 st.sidebar.title("GST Return Type")
-gst_type = st.sidebar.radio("Select GST Return Type", ["GSTR-1", "GSTR-3B"])
+gst_type = st.sidebar.radio("Select GST Return Type", ["GSTR-1", "GSTR-3B", "GSTR-1 vs GSTR-3B"])
 
-# Add refresh note
-st.sidebar.info("🔄 Kindly refresh the page to upload new files or start again.")
- 
-# GST State Code Mapping
-GST_STATE_CODES = {
-    "01": "Jammu and Kashmir", "02": "Himachal Pradesh", "03": "Punjab", "04": "Chandigarh",
-    "05": "Uttarakhand", "06": "Haryana", "07": "Delhi", "08": "Rajasthan", "09": "Uttar Pradesh",
-    "10": "Bihar", "11": "Sikkim", "12": "Arunachal Pradesh", "13": "Nagaland", "14": "Manipur",
-    "15": "Mizoram", "16": "Tripura", "17": "Meghalaya", "18": "Assam", "19": "West Bengal",
-    "20": "Jharkhand", "21": "Odisha", "22": "Chhattisgarh", "23": "Madhya Pradesh", "24": "Gujarat",
-    "26": "Dadra and Nagar Haveli and Daman and Diu", "27": "Maharashtra", "29": "Karnataka",
-    "30": "Goa", "31": "Lakshadweep", "32": "Kerala", "33": "Tamil Nadu", "34": "Puducherry",
-    "35": "Andaman and Nicobar Islands", "36": "Telangana", "37": "Andhra Pradesh", "38": "Ladakh",
-    "97": "Other Territory", "99": "Centre Jurisdiction",
-}
-
-# Helper function to get state from GSTIN
-def get_state_from_gstin(gstin):
-    if not gstin or len(gstin) < 2:
-        return "Unknown"
-    state_code = gstin[:2]
-    return GST_STATE_CODES.get(state_code, "Unknown")
- 
-# GSTR-1 Functions
-def extract_details(pdf_path):
-    details = {"GSTIN": "", "State": "", "Legal Name": "", "Month": "", "Financial Year": ""}
-   
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                gstin_match = re.search(r'GSTIN\s*[:\-]?\s*(\d{2}[A-Z0-9]{13})', text)
-                if gstin_match:
-                    details["GSTIN"] = gstin_match.group(1)
-                    details["State"] = GST_STATE_CODES.get(details["GSTIN"][:2], "Unknown")
-               
-                legal_name_match = re.search(r'Legal name of the registered person\s*[:\-]?\s*(.*)', text)
-                if legal_name_match:
-                    details["Legal Name"] = legal_name_match.group(1).strip()
-               
-                month_match = re.search(r'Tax period\s*[:\-]?\s*(\w+)', text)
-                if month_match:
-                    details["Month"] = month_match.group(1).strip()
-               
-                fy_match = re.search(r'Financial year\s*[:\-]?\s*(\d{4}-\d{2})', text)
-                if fy_match:
-                    details["Financial Year"] = fy_match.group(1).strip()
-               
-                break
-    return details
- 
-def extract_total_liability(pdf_bytes):
-    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-        text = "\n".join([page.get_text("text") for page in doc])
-   
-    pattern = r"Total Liability \(Outward supplies other than Reverse charge\)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)"
-    match = re.search(pattern, text)
-   
-    if match:
-        return [match.group(1), match.group(2), match.group(3), match.group(4), match.group(5)]
-    return ["Not Found", "", "", "", ""]
-
-# New function to extract Tables 4A and 4B
-def extract_tables_4A_4B(pdf_bytes):
-    tables = {
-        "4A": {
-            "description": "Taxable outward supplies made to registered persons (other than reverse charge supplies)",
-            "title": "B2B Regular",
-            "data": None
-        },
-        "4B": {
-            "description": "Taxable outward supplies made to registered persons attracting tax on reverse charge",
-            "title": "B2B Reverse charge",
-            "data": None
-        }
-    }
-    
-    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-        text = "\n".join([page.get_text("text") for page in doc])
-        
-        # Extract Table 4A
-        pattern_4A = r"4A - Taxable outward supplies made to registered persons.*?Total\s+(\d+)\s+Invoice\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)"
-        match_4A = re.search(pattern_4A, text, re.DOTALL)
-        
-        if match_4A:
-            tables["4A"]["data"] = {
-                "No. of records": match_4A.group(1),
-                "Value": match_4A.group(2),
-                "Integrated Tax": match_4A.group(3),
-                "Central Tax": match_4A.group(4),
-                "State/UT Tax": match_4A.group(5),
-                "Cess": match_4A.group(6)
-            }
-        
-        # Extract Table 4B
-        pattern_4B = r"4B - Taxable outward supplies made to registered persons attracting tax on reverse charge.*?Total\s+(\d+)\s+Invoice\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)"
-        match_4B = re.search(pattern_4B, text, re.DOTALL)
-        
-        if match_4B:
-            tables["4B"]["data"] = {
-                "No. of records": match_4B.group(1),
-                "Value": match_4B.group(2),
-                "Integrated Tax": match_4B.group(3),
-                "Central Tax": match_4B.group(4),
-                "State/UT Tax": match_4B.group(5),
-                "Cess": match_4B.group(6)
-            }
-    
-    return tables
+# Add note on adding and removing files
+st.sidebar.info("🔄 Add or remove files at any time; only newly added files are parsed. "
+                "ZIP archives of PDFs are read file by file without unpacking.")
+ 
+@st.cache_resource
+def get_extraction_cache():
+    # One cache for every session of this process, so a return uploaded by several users is parsed once.
+    # GST_CACHE_MB caps the memory its results take (default 512, 0 = no limit), least recently used
+    # results going first; set GST_CACHE_DIR to also persist results on disk
+    max_mb = float(os.environ.get("GST_CACHE_MB", 512))
+    return ExtractionCache(os.environ.get("GST_CACHE_DIR"), max_bytes=int(max_mb * 1e6) if max_mb else None)
+ 
+extraction_cache = get_extraction_cache()
  
-# GSTR-3B Functions
-def clean_numeric_value(value):
-    if value is None:
-        return 0.0
+@st.cache_resource
+def get_return_store(path):
+    return ReturnStore(path)
+ 
+# Optional SQLite store that keeps extracted returns across sessions; GST_STORE_PATH sets its location
+use_store = st.sidebar.checkbox("Keep returns in local store", value=bool(os.environ.get("GST_STORE_PATH")))
+return_store = get_return_store(os.environ.get("GST_STORE_PATH", "gst_returns.sqlite3")) if use_store else None
+ 
+# Number of processes used to parse uploaded PDFs
+max_workers = st.sidebar.number_input("Parallel workers", min_value=1, max_value=MAX_WORKERS,
+                                      value=default_worker_count())
+ 
+# With a budget, files are parsed a page at a time and any file that needs more memory fails
+try:
+    default_budget_mb = default_memory_budget_mb() or 0
+except ValueError as exc:
+    st.sidebar.error(f"{exc}; starting with no budget")
+    default_budget_mb = 0
+memory_budget_mb = st.sidebar.number_input("Memory budget per file (MB, 0 = off)", min_value=0,
+                                           value=int(default_budget_mb))
+ 
+# pdfplumber is the reference engine for GSTR-3B tables; PyMuPDF finds the same tables several times faster
+table_engine = st.sidebar.selectbox("GSTR-3B table engine", TABLE_ENGINES,
+                                    index=TABLE_ENGINES.index(default_table_engine()))
+ 
+# Large tables are summarised per GSTIN, year and period and sent to the browser a
+# page at a time; GST_PAGE_SIZE sets the default number of rows per page
+table_view = st.sidebar.radio("Result tables", ["Summary", "Detail"],
+                              help="Summary shows totals per GSTIN, financial year and period, with the rows "
+                                   "of one period on demand; Detail shows every extracted row")
+page_size = st.sidebar.number_input("Rows per page", min_value=10, max_value=5000, step=50,
+                                    value=int(os.environ.get("GST_PAGE_SIZE", 100)))
+ 
+# Stage timings of this session; set GST_PERF_LOG to also append them to a file as JSON lines
+show_performance = st.sidebar.checkbox("Show performance panel")
+if "performance_log" not in st.session_state:
+    st.session_state["performance_log"] = PerformanceLog(os.environ.get("GST_PERF_LOG"))
+performance_log = st.session_state["performance_log"]
+ 
+def show_performance_panel():
+    """Sidebar table of time per stage and the slowest files parsed in this session."""
+    if not show_performance:
+        return
+    with st.sidebar.expander("Performance", expanded=True):
+        if performance_log.batches:
+            batch = performance_log.batches[-1]
+            st.caption(f"Last upload: first results after {batch['first_result_seconds']:.2f} s, "
+                       f"{batch['files']} file(s) in {batch['seconds']:.2f} s")
+        peak_memory = performance_log.peak_memory()
+        if peak_memory is not None:
+            st.caption(f"Peak memory per file: {peak_memory / 1e6:.0f} MB"
+                       + (f" of {memory_budget_mb} MB budget" if memory_budget_mb else ""))
+        cache_stats = extraction_cache.stats()
+        st.caption(f"Shared result cache (all sessions): {cache_stats['entries']} results, "
+                   f"{cache_stats['bytes'] / 1e6:.1f} MB"
+                   + (f" of {cache_stats['max_bytes'] / 1e6:.0f} MB" if cache_stats["max_bytes"] else "")
+                   + f"; {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                     f"({cache_stats['waits']} served by another session's parse), "
+                     f"{cache_stats['evictions']} evictions")
+        stages = performance_log.stage_summary()
+        if stages.empty:
+            st.caption("No timings recorded yet.")
+            return
+        st.dataframe(stages, hide_index=True,
+                     column_config={"Seconds": st.column_config.NumberColumn(format="%.3f"),
+                                    "Share": st.column_config.ProgressColumn(min_value=0.0, max_value=1.0)})
+        st.caption("Slowest files")
+        st.dataframe(performance_log.slowest_files(), hide_index=True,
+                     column_config={"KB": st.column_config.NumberColumn(format="%.0f"),
+                                    "Seconds": st.column_config.NumberColumn(format="%.3f")})
+ 
+# Seconds between redraws while uploads are still being parsed
+STREAM_REFRESH_SECONDS = 0.5
+ 
+def expand_uploads(uploaded_files):
+    """
+    The uploaded PDFs with each ZIP upload replaced by the PDFs inside it, as
+    ArchiveMember objects read from the archive only when needed, and
+    {name: status} for every file found in the archives.
+    """
+    files = []
+    archive_status = {}
+    for uploaded_file in uploaded_files:
+        if not uploaded_file.name.lower().endswith(".zip"):
+            files.append(uploaded_file)
+            continue
+        try:
+            members, skipped = archive_members(uploaded_file, uploaded_file.name)
+        except zipfile.BadZipFile as exc:
+            st.error(f"Could not open {uploaded_file.name}: {exc}")
+            continue
+        files.extend(members)
+        archive_status.update((member.name, "queued") for member in members)
+        archive_status.update((name, f"skipped: {reason}") for name, reason in skipped)
+    return files, archive_status
+ 
+def upload_digest(upload):
+    """
+    Content hash of an upload, computed once per session: uploaded files are
+    known by their file_id and archive members by name, CRC and size, so reruns
+    neither re-read nor re-hash them.
+    """
+    digests = st.session_state.setdefault("upload_digests", {})
+    if isinstance(upload, ArchiveMember):
+        key = (upload.name, upload.crc, upload.size)
+    else:
+        key = upload.file_id
+    if key not in digests:
+        digests[key] = content_digest(upload.getvalue())
+    return digests[key]
+ 
+def show_archive_status(view, archive_status):
+    if view is not None:
+        view.dataframe(pd.DataFrame({"File": list(archive_status), "Status": list(archive_status.values())}),
+                       hide_index=True)
+ 
+def extract_uploaded_files(return_type, new_files, archive_status, failures):
+    """
+    Parse (key, uploaded_file) pairs across a process pool, showing progress, and
+    yield lists of (key, file name, result) as files finish: the first file on
+    its own, then whatever finished in each STREAM_REFRESH_SECONDS. Files are
+    read only when they are parsed. Files that fail are reported, recorded in
+    failures as {key: (file name, error)} and left out instead of aborting the
+    batch. The status of archive members is updated in archive_status.
+    """
+    progress_bar = st.empty()
    
-    if isinstance(value, str):
-        value = value.replace("E", "").replace("F", "").strip()
+    def show_progress(done, total, elapsed):
+        rate = done / elapsed if elapsed > 0 else 0.0
+        progress_bar.progress(done / total, text=f"Parsed {done}/{total} files ({rate:.1f} files/sec)")
    
-    try:
-        return float(value.replace(",", ""))
-    except ValueError:
-        return 0.0
- 
-def extract_general_details(text):
-    def safe_extract(pattern, text):
-        match = re.search(pattern, text)
-        return match.group(1).strip() if match else None
-   
-    gstin = safe_extract(r"GSTIN\s+([A-Z0-9]+)", text)
-    state = get_state_from_gstin(gstin)
-    
-    return {
-        "GSTIN": gstin,
-        "State": state,
-        "Legal Name": safe_extract(r"Legal name of the registered person\s+(.+)", text),
-        "Date": safe_extract(r"Date of ARN\s+([\d/]+)", text),
-        "Financial Year": safe_extract(r"Year\s+(\d{4}-\d{2})", text),
-        "Period": safe_extract(r"Period\s+([A-Za-z]+)", text),
-    }
+    # Reruns (e.g. filter changes) are served from the cache without reopening the PDFs
+    outcomes = iter_extract_files(
+        return_type,
+        [(uploaded_file.name, uploaded_file.getvalue) for _, uploaded_file in new_files],
+        cache=extraction_cache,
+        max_workers=int(max_workers),
+        on_progress=show_progress,
+        performance=performance_log,
+        memory_budget=int(memory_budget_mb * 1e6) if memory_budget_mb else None,
+        table_engine=table_engine,
+    )
+    batch = []
+    flushed_at = None
+    for index, result, error in outcomes:
+        key, uploaded_file = new_files[index]
+        if error:
+            st.error(f"Could not extract {uploaded_file.name}: {error}")
+            failures[key] = (uploaded_file.name, error)
+        else:
+            batch.append((key, uploaded_file.name, result))
+        if uploaded_file.name in archive_status:
+            archive_status[uploaded_file.name] = f"failed: {error}" if error else "extracted"
+        if batch and (flushed_at is None or time.perf_counter() - flushed_at >= STREAM_REFRESH_SECONDS):
+            yield batch
+            batch = []
+            flushed_at = time.perf_counter()
+    if batch:
+        yield batch
+    progress_bar.empty()
  
-def extract_table_4(pdf):
-    expected_rows = [
-        "A. ITC Available (whether in full or part)",
-        "(1) Import of goods",
-        "(2) Import of services",
-        "(3) Inward supplies liable to reverse charge",
-        "(4) Inward supplies from ISD",
-        "(5) All other ITC",
-        "B. ITC Reversed",
-        "(1) As per rules 38,42 & 43 of CGST Rules and section 17(5)",
-        "(2) Others",
-        "C. Net ITC available (A-B)",
-        "D. Other Details",
-        "(1) ITC reclaimed which was reversed under Table 4(B)(2) in earlier tax period",
-        "(2) Ineligible ITC under section 16(4) & ITC restricted due to PoS rules"
-    ]
-   
-    value_map = {}
-    table_started = False
+def failed_extractions(return_type, uploads):
+    """
+    {key: (file name, error)} of the uploads that could not be extracted, kept
+    across reruns so they are reported again rather than re-parsed. Cleared
+    when the uploads, the table engine or the memory budget change.
+    """
+    failures_key = (frozenset(uploads), table_engine, memory_budget_mb)
+    cached = st.session_state.get(f"failed extractions {return_type}")
+    if cached is None or cached[0] != failures_key:
+        st.session_state[f"failed extractions {return_type}"] = cached = (failures_key, {})
+    return cached[1]
+ 
+def store_year_selector(return_type):
+    """
+    Sidebar selector of the financial years of stored return_type returns to
+    load. Every year starts out selected, and so does any year that appears
+    later (e.g. of returns stored since), rather than being left out.
+    """
+    key = f"financial years {return_type}"
+    financial_years = return_store.financial_years(return_type)
+    offered = st.session_state.get(f"{key} offered")
+    if key not in st.session_state or offered is None:
+        selection = financial_years
+    else:
+        selection = [year for year in financial_years if year in st.session_state[key] or year not in offered]
+    # Set through session state: a keyed multiselect ignores default= after its first run
+    st.session_state[key] = selection
+    st.session_state[f"{key} offered"] = financial_years
+    return st.sidebar.multiselect(f"{return_type} financial years to load from store", financial_years, key=key)
+ 
+def stream_returns(return_type, uploaded_files, session, build):
+    """
+    Bring session up to date with the uploaded files (the PDFs in ZIP uploads
+    included) or, with the local store enabled, with the stored returns of the
+    selected financial years plus every uploaded file, stored or not.
+    Files are keyed by content hash and parsed at most once. Yields whenever
+    there is something new to draw: once the files that need no parsing are in
+    the tables, then after each batch of newly parsed files is appended, so
+    results show while the rest are parsed. The time until the first parsed
+    rows were ready is added to the performance log, and the status of each
+    file in a ZIP upload is shown in a table that updates as they are parsed.
+    Files that failed to extract are not retried until the uploads change.
+    """
+    files, archive_status = expand_uploads(uploaded_files)
+    status_view = st.expander(f"ZIP archive contents ({len(archive_status)} files)").empty() if archive_status else None
+    uploads = {}
+    for uploaded_file in files:
+        try:
+            key = upload_digest(uploaded_file)
+        except Exception as exc:
+            # Only archive members are read here; a corrupt one is reported and left out
+            archive_status[uploaded_file.name] = f"failed: {type(exc).__name__}: {exc}"
+            continue
+        if key in uploads and uploaded_file.name in archive_status:
+            archive_status[uploaded_file.name] = f"duplicate of {uploads[key].name}"
+        uploads.setdefault(key, uploaded_file)
    
-    for page in pdf.pages:
-        text = page.extract_text()
-        tables = page.extract_tables()
-       
-        if "4. Eligible ITC" in text or "Eligible ITC" in text:
-            table_started = True
-       
-        if table_started:
-            for table in tables:
-                if not table:
-                    continue
-               
-                for row in table:
-                    if not row or len(row) < 4:
-                        continue
-                   
-                    row = [str(cell).strip() if cell is not None else '' for cell in row]
-                    row_text = row[0]
-                   
-                    if "Details" in row_text or "Integrated" in row_text:
-                        continue
-                   
-                    values = []
-                    for cell in row[1:5]:
-                        try:
-                            value = clean_numeric_value(cell)
-                            values.append(value)
-                        except:
-                            values.append(0.0)
-                   
-                    while len(values) < 4:
-                        values.append(0.0)
-                   
-                    for expected_row in expected_rows:
-                        if expected_row.lower().replace(" ", "") in row_text.lower().replace(" ", ""):
-                            value_map[expected_row] = values
-                            break
-           
-            if "5." in text or "Details of amount paid" in text or "Payment of tax" in text:
-                break
+    failures = failed_extractions(return_type, uploads)
+    for file_name, error in failures.values():
+        st.error(f"Could not extract {file_name}: {error}")
    
-    data = []
-    for row_header in expected_rows:
-        if row_header in value_map:
-            data.append([row_header] + value_map[row_header])
+    known_keys = set(session.keys)
+    with performance_log.activate():
+        if return_store is None:
+            # Drop files that were removed; those still uploaded need no result
+            new_files = [(key, uploaded_file) for key, uploaded_file in uploads.items()
+                         if key not in known_keys and key not in failures]
+            new_keys = {key for key, _ in new_files}
+            session.sync([(key, uploaded_file.name, None) for key, uploaded_file in uploads.items()
+                          if key in known_keys], build)
         else:
-            data.append([row_header] + [0.0] * 4)
+            new_files = [(key, uploaded_file) for key, uploaded_file in uploads.items()
+                         if key not in failures and not return_store.contains(return_type, key)]
+            new_keys = {key for key, _ in new_files}
+            # Filled in again once this run's new uploads are stored
+            store_count = st.sidebar.empty()
+            store_count.caption(f"{return_store.count(return_type)} {return_type} returns in store")
+            stored = return_store.keys(return_type, financial_years=store_year_selector(return_type))
+            # Stored uploads are shown even when their financial year is not selected
+            shown_keys = {digest for digest, _ in stored}
+            stored += [(key, uploaded_file.name) for key, uploaded_file in uploads.items()
+                       if key not in shown_keys and key not in new_keys and key not in failures]
+            results = return_store.results(return_type, [digest for digest, _ in stored if digest not in known_keys])
+            session.sync([(digest, file_name, results.get(digest)) for digest, file_name in stored], build)
+    for key, uploaded_file in uploads.items():
+        if key in failures and uploaded_file.name in archive_status:
+            archive_status[uploaded_file.name] = f"failed: {failures[key][1]}"
+        elif key not in new_keys and uploaded_file.name in archive_status:
+            archive_status[uploaded_file.name] = "extracted" if return_store is None else "in store"
+    show_archive_status(status_view, archive_status)
+    if session.keys or not new_files:
+        yield
    
-    df = pd.DataFrame(data, columns=["Details", "Integrated Tax", "Central Tax", "State/UT Tax", "Cess"])
-    return df
+    start = time.perf_counter()
+    first_result_seconds = None
+    shown = 0
+    try:
+        for batch in extract_uploaded_files(return_type, new_files, archive_status, failures):
+            show_archive_status(status_view, archive_status)
+            if return_store is not None:
+                for key, file_name, result in batch:
+                    return_store.add(return_type, file_name, key, result)
+            with performance_log.activate():
+                session.append(batch, build)
+            if first_result_seconds is None:
+                first_result_seconds = time.perf_counter() - start
+            shown += len(batch)
+            yield
+        show_archive_status(status_view, archive_status)
+        if return_store is not None and new_files:
+            store_count.caption(f"{return_store.count(return_type)} {return_type} returns in store")
+    finally:
+        # Also when a rerun (e.g. a filter change) stops the stream part way
+        if first_result_seconds is not None:
+            performance_log.add_batch(return_type, shown, time.perf_counter() - start, first_result_seconds)
  
-def extract_table_3_1(pdf):
-    expected_columns = ["Nature of Supplies", "Total Taxable Value", "Integrated Tax", "Central Tax", "State/UT Tax", "Cess"]
-   
-    for page in pdf.pages:
-        text = page.extract_text()
-        if "3.1" in text and "Nature of Supplies" in text:
-            table = page.extract_table()
-            if table:
-                df = pd.DataFrame(table[1:], columns=table[0])
-                df = df.iloc[:, :len(expected_columns)]
-                df.columns = expected_columns
-               
-                for col in expected_columns[1:]:
-                    df[col] = df[col].apply(clean_numeric_value)
-                return df
-   
-    return pd.DataFrame(columns=expected_columns)
+def show_while_streaming(session, updates, draw):
+    """
+    Call draw() now and again after every update from stream_returns, so the
+    tables fill in while the remaining files are parsed, and return what the
+    last call returned. Filters built beforehand offer the values of the files
+    parsed by then; if more arrived, the script is rerun once parsing is done so
+    that their options cover every file.
+    """
+    version = session.version
+    drawn = draw()
+    for _ in updates:
+        drawn = draw()
+    if session.version != version:
+        st.rerun()
+    return drawn
  
-def extract_table_6_1(pdf):
-    expected_columns = ["Description", "Total Tax Payable", "Tax Paid Through ITC",
-                       "Tax Paid in Cash", "Interest Paid in Cash", "Late Fee Paid in Cash"]
-   
-    for page in pdf.pages:
-        text = page.extract_text()
-        if "Payment of tax" in text:
-            table = page.extract_table()
-            if table:
-                df = pd.DataFrame(table[1:], columns=table[0])
-                df = df.iloc[:, :len(expected_columns)]
-                df.columns = expected_columns
-               
-                for col in expected_columns[1:]:
-                    df[col] = df[col].apply(clean_numeric_value)
-                return df
+def multiselect_with_select_all(label, options):
+    selected = st.multiselect(label, ["Select All"] + options, default=["Select All"])
+    # "Select All" leaves the dimension unconstrained
+    return None if "Select All" in selected else selected
+ 
+def paged_table(key, columns, hide_index=False):
+    """
+    Sort and page controls for one table and the placeholder it is drawn into.
+    Like the filters, the controls are created before the table is first drawn,
+    so that redraws while uploads stream in reuse them. Returns draw(frame), which
+    sorts frame on the server and sends only the selected page to the browser.
+    """
+    sort_column, order_column, page_column = st.columns([3, 2, 1])
+    sort_by = sort_column.selectbox("Sort by", ["Original order"] + list(columns), key=f"{key} sort by")
+    descending = order_column.selectbox("Order", ["Ascending", "Descending"], key=f"{key} order") == "Descending"
+    page = page_column.number_input("Page", min_value=1, value=1, step=1, key=f"{key} page")
+    view = st.empty()
    
-    return pd.DataFrame(columns=expected_columns)
+    def draw(frame):
+        pages = page_count(len(frame), page_size)
+        shown_page = min(page, pages)
+        rows = table_page(frame, shown_page, page_size, None if sort_by == "Original order" else sort_by, descending)
+        with view.container():
+            st.dataframe(rows, hide_index=hide_index)
+            first_row = (shown_page - 1) * page_size
+            st.caption(f"Rows {min(first_row + 1, len(frame)):,}–{first_row + len(rows):,} of {len(frame):,} "
+                       f"(page {shown_page} of {pages})")
+    return draw
+ 
+def drill_down_selectbox(dimension, selections, period_column):
+    """Choice of one (GSTIN, financial year, period) among the files the filters select, or None."""
+    keys = ["GSTIN", "Financial Year", period_column]
+    groups = dimension[select_files(dimension, selections)][keys].dropna().drop_duplicates().astype(str)
+    month = groups[period_column].map({name: position for position, name in enumerate(FISCAL_MONTHS)})
+    groups = groups.assign(_month=month).sort_values(["GSTIN", "Financial Year", "_month", period_column])
+    options = {" · ".join(group): group for group in groups[keys].itertuples(index=False, name=None)}
+    chosen = st.selectbox("Drill down into", list(options), index=None,
+                          placeholder="Choose a GSTIN, financial year and period")
+    return options.get(chosen)
  
-def create_combined_gstr3b_sheet(general_df, table_3_1_df, table_4_df, table_6_1_df):
+def show_drill_down(view, group, dimension, file_mask, period_column, session, tables):
     """
-    Create a single combined sheet with all GSTR-3B data organized systematically
+    Draw into view the rows of session's tables ({heading: table name}) that come
+    from the selected files of group, as chosen with drill_down_selectbox(). These
+    are the returns of a single period, so they are shown in full.
     """
-    # Initialize an empty DataFrame for the combined sheet
-    combined_df = pd.DataFrame()
+    if group is None:
+        view.caption("Choose a GSTIN and period above to see the rows of its returns.")
+        return
+    group_mask = file_mask & select_files(dimension, {column: [value] for column, value in
+                                                      zip(["GSTIN", "Financial Year", period_column], group)})
+    with view.container():
+        for heading, name in tables.items():
+            st.write(f"### {heading}")
+            st.dataframe(slice_by_files(session.tables[name], session.file_keys(name), dimension, group_mask))
+ 
+def export_download_button(label, file_name, mime, build, state_key):
+    """
+    Download button whose file is only built, in memory, when the user clicks it.
+    The bytes are kept per session for the current filter state, so repeated
+    downloads with unchanged filters are served without rebuilding.
+    """
+    # A plain dict captured by the callback, which runs outside the script run
+    export_cache = st.session_state.setdefault("exports", {})
    
-    # Process all files
-    unique_files = set(table_3_1_df["File Name"].unique()) | set(table_4_df["File Name"].unique()) | set(table_6_1_df["File Name"].unique())
+    def build_export():
+        if export_cache.get(file_name, (None,))[0] != state_key:
+            with performance_log.activate("export"):
+                export_cache[file_name] = (state_key, build())
+        return export_cache[file_name][1]
    
-    rows = []
+    st.download_button(label, data=build_export, file_name=file_name, mime=mime, on_click="ignore")
+ 
+def export_buttons(file_prefix, excel_label, excel_sheets, columnar_tables, partition_columns, state_key):
+    """Excel download plus Parquet, gzip CSV and GSTIN/year/period partitioned ZIP exports."""
+    excel_column, parquet_column, csv_column, partitioned_column = st.columns(4)
+    with excel_column:
+        export_download_button(excel_label, f"{file_prefix}.xlsx",
+                               "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                               lambda: write_excel(excel_sheets), state_key)
+    with parquet_column:
+        export_download_button("Download as Parquet", f"{file_prefix}_parquet.zip", "application/zip",
+                               lambda: write_parquet_archive(columnar_tables()), state_key)
+    with csv_column:
+        export_download_button("Download as CSV (gzip)", f"{file_prefix}_csv.zip", "application/zip",
+                               lambda: write_csv_gzip_archive(columnar_tables()), state_key)
+    with partitioned_column:
+        export_download_button("Download partitioned by GSTIN/FY/period", f"{file_prefix}_partitioned.zip",
+                               "application/zip",
+                               lambda: write_partitioned_archive(columnar_tables(), partition_columns), state_key)
+ 
+# Per-file rows of each table; SessionTables builds them once per new file and tags them with "_file"
+GSTR1_COLUMNS = ["File Name", "GSTIN", "State", "Legal Name", "Month", "Financial Year", "Taxable Value", "IGST", "CGST", "SGST", "Cess"]
+GSTR1_4AB_COLUMNS = ["File Name", "GSTIN", "State", "Legal Name", "Month", "Financial Year", "No. of records", "Value", "Integrated Tax", "Central Tax", "State/UT Tax", "Cess"]
+ 
+# Columns of summarize_returns() over each return type's summary amounts
+GSTR1_SUMMARY_COLUMNS = ["GSTIN", "Financial Year", "Month", "Legal Name", "Returns"] + GSTR1_COLUMNS[6:]
+GSTR3B_SUMMARY_COLUMNS = (["GSTIN", "Financial Year", "Period", "Legal Name", "Returns"]
+                          + [name for name, _, _, _, _ in GSTR3B_SUMMARY_AMOUNTS])
+ 
+def build_gstr1_tables(batch):
+    data = []
+    table_4A_data = []
+    table_4B_data = []
+    
+    for position, (file_name, result) in enumerate(batch):
+        details = result["details"]
+        total_liability = result["total_liability"]
+        data.append([file_name] + list(details.values()) + total_liability + [position])
+        
+        # Tables 4A and 4B
+        tables_4A_4B = result["tables_4A_4B"]
+        
+        # Process Table 4A
+        if tables_4A_4B["4A"]["data"]:
+            table_4A_data.append([
+                file_name,
+                details["GSTIN"],
+                details["State"],  # Added State column here
+                details["Legal Name"],
+                details["Month"],
+                details["Financial Year"],
+                tables_4A_4B["4A"]["data"]["No. of records"],
+                tables_4A_4B["4A"]["data"]["Value"],
+                tables_4A_4B["4A"]["data"]["Integrated Tax"],
+                tables_4A_4B["4A"]["data"]["Central Tax"],
+                tables_4A_4B["4A"]["data"]["State/UT Tax"],
+                tables_4A_4B["4A"]["data"]["Cess"],
+                position,
+            ])
+        
+        # Process Table 4B
+        if tables_4A_4B["4B"]["data"]:
+            table_4B_data.append([
+                file_name,
+                details["GSTIN"],
+                details["State"],  # Added State column here
+                details["Legal Name"],
+                details["Month"],
+                details["Financial Year"],
+                tables_4A_4B["4B"]["data"]["No. of records"],
+                tables_4A_4B["4B"]["data"]["Value"],
+                tables_4A_4B["4B"]["data"]["Integrated Tax"],
+                tables_4A_4B["4B"]["data"]["Central Tax"],
+                tables_4A_4B["4B"]["data"]["State/UT Tax"],
+                tables_4A_4B["4B"]["data"]["Cess"],
+                position,
+            ])
    
-    for idx, file_name in enumerate(unique_files):
-        # Get general details for this file
-        file_general_details = general_df[general_df.index == idx].to_dict(orient='records')
-        if file_general_details:
-            general_info = file_general_details[0]
-        else:
-            general_info = {"GSTIN": "Unknown", "Legal Name": "Unknown", "Date": "Unknown",
-                           "Financial Year": "Unknown", "Period": "Unknown", "State": "Unknown"}
-       
-        # Create a row with file and general information
-        base_row = {
-            "File Name": file_name,
-            "GSTIN": general_info.get("GSTIN", "Unknown"),
-            "State": general_info.get("State", "Unknown"),
-            "Legal Name": general_info.get("Legal Name", "Unknown"),
-            "Date": general_info.get("Date", "Unknown"),
-            "Financial Year": general_info.get("Financial Year", "Unknown"),
-            "Period": general_info.get("Period", "Unknown"),
-            "Data Type": "",
-            "Description": "",
-            "Total Taxable Value": 0.0,
-            "Integrated Tax": 0.0,
-            "Central Tax": 0.0,
-            "State/UT Tax": 0.0,
-            "Cess": 0.0,
-            "Total Tax Payable": 0.0,
-            "Tax Paid Through ITC": 0.0,
-            "Tax Paid in Cash": 0.0,
-            "Interest Paid in Cash": 0.0,
-            "Late Fee Paid in Cash": 0.0
-        }
-       
-        # Add a header row for this file
-        header_row = base_row.copy()
-        header_row["Data Type"] = "FILE INFO"
-        header_row["Description"] = "File Information"
-        rows.append(header_row)
-       
-        # Add 3.1 data
-        file_table_3_1 = table_3_1_df[table_3_1_df["File Name"] == file_name]
-        if not file_table_3_1.empty:
-            for _, row in file_table_3_1.iterrows():
-                data_row = base_row.copy()
-                data_row["Data Type"] = "Table 3.1"
-                data_row["Description"] = row.get("Nature of Supplies", "")
-                data_row["Total Taxable Value"] = row.get("Total Taxable Value", 0.0)
-                data_row["Integrated Tax"] = row.get("Integrated Tax", 0.0)
-                data_row["Central Tax"] = row.get("Central Tax", 0.0)
-                data_row["State/UT Tax"] = row.get("State/UT Tax", 0.0)
-                data_row["Cess"] = row.get("Cess", 0.0)
-                rows.append(data_row)
+    # Amounts as exact decimals; a Total Liability line that was not found stays missing
+    tables = {
+        "Total Liability": parse_amount_columns(pd.DataFrame(data, columns=GSTR1_COLUMNS + ["_file"]),
+                                                GSTR1_COLUMNS[6:], invalid_as_zero=False),
+        "Table 4A": parse_amount_columns(pd.DataFrame(table_4A_data, columns=GSTR1_4AB_COLUMNS + ["_file"]),
+                                         GSTR1_4AB_COLUMNS[7:]),
+        "Table 4B": parse_amount_columns(pd.DataFrame(table_4B_data, columns=GSTR1_4AB_COLUMNS + ["_file"]),
+                                         GSTR1_4AB_COLUMNS[7:]),
+    }
+    for table in ("Table 4A", "Table 4B"):
+        tables[table]["No. of records"] = parse_counts(tables[table]["No. of records"]).to_numpy()
+    return tables
+ 
+def build_gstr3b_tables(batch):
+    all_general_details = []
+    all_table_3_1 = []
+    all_table_4 = []
+    all_table_6_1 = []
+   
+    for position, (file_name, result) in enumerate(batch):
+        all_general_details.append({"File Name": file_name, **result["general_details"], "_file": position})
        
-        # Add Table 4 data
-        file_table_4 = table_4_df[table_4_df["File Name"] == file_name]
-        if not file_table_4.empty:
-            for _, row in file_table_4.iterrows():
-                data_row = base_row.copy()
-                data_row["Data Type"] = "Table 4"
-                data_row["Description"] = row.get("Details", "")
-                data_row["Integrated Tax"] = row.get("Integrated Tax", 0.0)
-                data_row["Central Tax"] = row.get("Central Tax", 0.0)
-                data_row["State/UT Tax"] = row.get("State/UT Tax", 0.0)
-                data_row["Cess"] = row.get("Cess", 0.0)
-                rows.append(data_row)
+        # Copy cached tables so tagging them with the file name never mutates the cache
+        table_3_1 = result["table_3_1"].copy()
+        table_3_1["File Name"] = file_name
+        table_3_1["_file"] = position
+        all_table_3_1.append(table_3_1)
        
-        # Add Table 6.1 data
-        file_table_6_1 = table_6_1_df[table_6_1_df["File Name"] == file_name]
-        if not file_table_6_1.empty:
-            for _, row in file_table_6_1.iterrows():
-                data_row = base_row.copy()
-                data_row["Data Type"] = "Table 6.1"
-                data_row["Description"] = row.get("Description", "")
-                data_row["Total Tax Payable"] = row.get("Total Tax Payable", 0.0)
-                data_row["Tax Paid Through ITC"] = row.get("Tax Paid Through ITC", 0.0)
-                data_row["Tax Paid in Cash"] = row.get("Tax Paid in Cash", 0.0)
-                data_row["Interest Paid in Cash"] = row.get("Interest Paid in Cash", 0.0)
-                data_row["Late Fee Paid in Cash"] = row.get("Late Fee Paid in Cash", 0.0)
-                rows.append(data_row)
+        table_4 = result["table_4"].copy()
+        table_4["File Name"] = file_name
+        table_4["_file"] = position
+        all_table_4.append(table_4)
        
-        # Add a separator row
-        separator_row = {k: "" for k in base_row.keys()}
-        separator_row["Description"] = "----------------------"
-        rows.append(separator_row)
+        table_6_1 = result["table_6_1"].copy()
+        table_6_1["File Name"] = file_name
+        table_6_1["_file"] = position
+        all_table_6_1.append(table_6_1)
+   
+    general_df = pd.DataFrame(all_general_details)
+    final_table_3_1 = pd.concat(all_table_3_1, ignore_index=True)
+    final_table_4 = pd.concat(all_table_4, ignore_index=True)
+    final_table_6_1 = pd.concat(all_table_6_1, ignore_index=True)
+   
+    # The combined sheet has one block per file, in batch order, keyed by position so same-named files stay apart
+    combined_df = create_combined_gstr3b_sheet(general_df, final_table_3_1, final_table_4, final_table_6_1,
+                                               key_column="_file")
    
-    # Create DataFrame from rows
-    combined_df = pd.DataFrame(rows)
-    return combined_df
+    return {
+        "General Details": general_df,
+        "Table 3.1": final_table_3_1,
+        "Table 4": final_table_4,
+        "Table 6.1": final_table_6_1,
+        "Combined": combined_df,
+    }
+ 
+def session_tables(return_type):
+    """This session's SessionTables for return_type, kept across reruns."""
+    key = f"session_tables {return_type}"
+    if key not in st.session_state:
+        st.session_state[key] = SessionTables()
+    return st.session_state[key]
  
 # Main Application Logic
 if gst_type == "GSTR-1":
     st.title("📄 GSTR-1 Data Extraction Tool")
-    st.write("Drag and Drop or Upload GSTR-1 PDFs to extract details")
+    st.write("Drag and Drop or Upload GSTR-1 PDFs, or ZIP archives of them, to extract details")
    
-    uploaded_files = st.file_uploader("", type=["pdf"], accept_multiple_files=True)
+    uploaded_files = st.file_uploader("", type=["pdf", "zip"], accept_multiple_files=True)
+    session = session_tables("GSTR-1")
+    updates = stream_returns("GSTR-1", uploaded_files or [], session, build_gstr1_tables)
+    next(updates, None)  # Returns already parsed, or the first ones to finish
    
-    if uploaded_files:
-        data = []
-        table_4A_data = []
-        table_4B_data = []
-        
-        for uploaded_file in uploaded_files:
-            pdf_bytes = uploaded_file.read()
-            details = extract_details(uploaded_file)
-            total_liability = extract_total_liability(pdf_bytes)
-            data.append([uploaded_file.name] + list(details.values()) + total_liability)
-            
-            # Extract Tables 4A and 4B
-            tables_4A_4B = extract_tables_4A_4B(pdf_bytes)
-            
-            # Process Table 4A
-            if tables_4A_4B["4A"]["data"]:
-                table_4A_data.append([
-                    uploaded_file.name,
-                    details["GSTIN"],
-                    details["State"],  # Added State column here
-                    details["Legal Name"],
-                    details["Month"],
-                    details["Financial Year"],
-                    tables_4A_4B["4A"]["data"]["No. of records"],
-                    tables_4A_4B["4A"]["data"]["Value"],
-                    tables_4A_4B["4A"]["data"]["Integrated Tax"],
-                    tables_4A_4B["4A"]["data"]["Central Tax"],
-                    tables_4A_4B["4A"]["data"]["State/UT Tax"],
-                    tables_4A_4B["4A"]["data"]["Cess"]
-                ])
-            
-            # Process Table 4B
-            if tables_4A_4B["4B"]["data"]:
-                table_4B_data.append([
-                    uploaded_file.name,
-                    details["GSTIN"],
-                    details["State"],  # Added State column here
-                    details["Legal Name"],
-                    details["Month"],
-                    details["Financial Year"],
-                    tables_4A_4B["4B"]["data"]["No. of records"],
-                    tables_4A_4B["4B"]["data"]["Value"],
-                    tables_4A_4B["4B"]["data"]["Integrated Tax"],
-                    tables_4A_4B["4B"]["data"]["Central Tax"],
-                    tables_4A_4B["4B"]["data"]["State/UT Tax"],
-                    tables_4A_4B["4B"]["data"]["Cess"]
-                ])
-       
-        columns = ["File Name", "GSTIN", "State", "Legal Name", "Month", "Financial Year", "Taxable Value", "IGST", "CGST", "SGST", "Cess"]
-        df = pd.DataFrame(data, columns=columns)
-        
-        # Create DataFrames for Tables 4A and 4B
-        columns_4AB = ["File Name", "GSTIN", "State", "Legal Name", "Month", "Financial Year", "No. of records", "Value", "Integrated Tax", "Central Tax", "State/UT Tax", "Cess"]
-        df_4A = pd.DataFrame(table_4A_data, columns=columns_4AB)
-        df_4B = pd.DataFrame(table_4B_data, columns=columns_4AB)
-       
-        st.write("### Total Liability (Outward supplies other than Reverse charge) ")
-        st.dataframe(df)
-
-       
-        def multiselect_with_select_all(label, options):
-            selected = st.multiselect(label, ["Select All"] + options, default=["Select All"])
-            return options if "Select All" in selected else selected
-       
-        selected_month = multiselect_with_select_all("Filter by Month", df["Month"].unique().tolist())
-        selected_state = multiselect_with_select_all("Filter by State", df["State"].unique().tolist())
-        selected_gstin = multiselect_with_select_all("Filter by GSTIN", df["GSTIN"].unique().tolist())
-        selected_legal_name = multiselect_with_select_all("Filter by Legal Name", df["Legal Name"].unique().tolist())
-        selected_year = multiselect_with_select_all("Filter by Financial Year", df["Financial Year"].unique().tolist())
+    if session.keys:
+        if table_view == "Detail":
+            st.write("### Total Liability (Outward supplies other than Reverse charge) ")
+            total_liability_view = paged_table("GSTR-1 total liability", GSTR1_COLUMNS)
        
-        filtered_df = df
-        filtered_df_4A = df_4A
-        filtered_df_4B = df_4B
-        
-        if selected_month:
-            filtered_df = filtered_df[filtered_df["Month"].isin(selected_month)]
-            filtered_df_4A = filtered_df_4A[filtered_df_4A["Month"].isin(selected_month)]
-            filtered_df_4B = filtered_df_4B[filtered_df_4B["Month"].isin(selected_month)]
-            
-        if selected_state:
-            filtered_df = filtered_df[filtered_df["State"].isin(selected_state)]
-            filtered_df_4A = filtered_df_4A[filtered_df_4A["State"].isin(selected_state)]
-            filtered_df_4B = filtered_df_4B[filtered_df_4B["State"].isin(selected_state)]
-            
-        if selected_gstin:
-            filtered_df = filtered_df[filtered_df["GSTIN"].isin(selected_gstin)]
-            filtered_df_4A = filtered_df_4A[filtered_df_4A["GSTIN"].isin(selected_gstin)]
-            filtered_df_4B = filtered_df_4B[filtered_df_4B["GSTIN"].isin(selected_gstin)]
-            
-        if selected_legal_name:
-            filtered_df = filtered_df[filtered_df["Legal Name"].isin(selected_legal_name)]
-            filtered_df_4A = filtered_df_4A[filtered_df_4A["Legal Name"].isin(selected_legal_name)]
-            filtered_df_4B = filtered_df_4B[filtered_df_4B["Legal Name"].isin(selected_legal_name)]
-            
-        if selected_year:
-            filtered_df = filtered_df[filtered_df["Financial Year"].isin(selected_year)]
-            filtered_df_4A = filtered_df_4A[filtered_df_4A["Financial Year"].isin(selected_year)]
-            filtered_df_4B = filtered_df_4B[filtered_df_4B["Financial Year"].isin(selected_year)]
+        # One row per file; the filters select file IDs and every table is sliced by them
+        filter_columns = ["Month", "State", "GSTIN", "Legal Name", "Financial Year"]
+        dimension = build_file_dimension(session.tables["Total Liability"], session.file_keys("Total Liability"),
+                                         filter_columns)
+        selections = {
+            column: multiselect_with_select_all(f"Filter by {column}", dimension[column].cat.categories.tolist())
+            for column in filter_columns
+        }
        
-        st.write("### Filtered Results - Total Liability")
-        st.dataframe(filtered_df)
-        
-        st.write("### Filtered Results - Table 4A")
-        st.dataframe(filtered_df_4A)
-        
-        st.write("### Filtered Results - Table 4B")
-        st.dataframe(filtered_df_4B)
+        if table_view == "Summary":
+            st.write("### Summary by GSTIN, Financial Year and Month")
+            summary_view = paged_table("GSTR-1 summary", GSTR1_SUMMARY_COLUMNS, hide_index=True)
+            drill_down = drill_down_selectbox(dimension, selections, "Month")
+            drill_down_view = st.empty()
+        else:
+            st.write("### Filtered Results - Total Liability")
+            filtered_view = paged_table("GSTR-1 filtered total liability", GSTR1_COLUMNS)
+            st.write("### Filtered Results - Table 4A")
+            filtered_4A_view = paged_table("GSTR-1 filtered table 4A", GSTR1_4AB_COLUMNS)
+            st.write("### Filtered Results - Table 4B")
+            filtered_4B_view = paged_table("GSTR-1 filtered table 4B", GSTR1_4AB_COLUMNS)
        
-        # Add Excel download functionality for GSTR-1
-        output_excel = "GSTR1_Filtered.xlsx"
-        with pd.ExcelWriter(output_excel) as writer:
-            # Only include filtered data in the Excel file
-            filtered_df.to_excel(writer, sheet_name="Filtered Total Liability", index=False)
-            filtered_df_4A.to_excel(writer, sheet_name="Filtered Table 4A", index=False)
-            filtered_df_4B.to_excel(writer, sheet_name="Filtered Table 4B", index=False)
+        def draw_gstr1():
+            df = session.tables["Total Liability"]
+            dimension = build_file_dimension(df, session.file_keys("Total Liability"), filter_columns)
+            file_mask = select_files(dimension, selections)
+           
+            def filtered(name, key_column=None):
+                table = session.tables[name] if key_column is None else session.with_keys(name, key_column)
+                return slice_by_files(table, session.file_keys(name), dimension, file_mask)
+           
+            filtered_df = filtered("Total Liability")
+            filtered_df_4A = filtered("Table 4A")
+            filtered_df_4B = filtered("Table 4B")
+           
+            if table_view == "Summary":
+                # Returns are counted by file key, as different files may share a name
+                summary_view(summarize_returns(filtered("Total Liability", "File Key"), "Month", GSTR1_COLUMNS[6:],
+                                               key_column="File Key"))
+                show_drill_down(drill_down_view, drill_down, dimension, file_mask, "Month", session, {
+                    "Total Liability": "Total Liability",
+                    "Table 4A": "Table 4A",
+                    "Table 4B": "Table 4B",
+                })
+            else:
+                total_liability_view(df)
+                filtered_view(filtered_df)
+                filtered_4A_view(filtered_df_4A)
+                filtered_4B_view(filtered_df_4B)
+           
+            # Add download functionality for GSTR-1 (only filtered data is included)
+            filtered_tables = {
+                "Filtered Total Liability": filtered_df,
+                "Filtered Table 4A": filtered_df_4A,
+                "Filtered Table 4B": filtered_df_4B,
+            }
+            return filtered_tables, ("GSTR-1", tuple(dimension["File Key"]), file_mask.tobytes())
        
-        with open(output_excel, "rb") as f:
-            st.download_button("Download Filtered Data as Excel", f, file_name="GSTR1_Filtered.xlsx")
+        filtered_tables, state_key = show_while_streaming(session, updates, draw_gstr1)
+        show_performance_panel()
+        export_buttons(
+            "GSTR1_Filtered", "Download Filtered Data as Excel", filtered_tables,
+            lambda: {name.replace("Filtered ", ""): table for name, table in filtered_tables.items()},
+            ["GSTIN", "Financial Year", "Month"],
+            state_key,
+        )
  
-else:  # GSTR-3B
+elif gst_type == "GSTR-3B":
     st.title("📄 GSTR-3B Data Extraction Tool")
-    st.write("Drag and Drop or Upload GSTR-3B PDFs to extract details")
+    st.write("Drag and Drop or Upload GSTR-3B PDFs, or ZIP archives of them, to extract details")
    
-    uploaded_files = st.file_uploader("", type="pdf", accept_multiple_files=True)
+    uploaded_files = st.file_uploader("", type=["pdf", "zip"], accept_multiple_files=True)
+    session = session_tables("GSTR-3B")
+    updates = stream_returns("GSTR-3B", uploaded_files or [], session, build_gstr3b_tables)
+    next(updates, None)  # Returns already parsed, or the first ones to finish
    
-    if uploaded_files:
-        all_general_details = []
-        all_table_3_1 = []
-        all_table_4 = []
-        all_table_6_1 = []
-       
-        for pdf_file in uploaded_files:
-            with pdfplumber.open(pdf_file) as pdf:
-                full_text = "\n".join([page.extract_text() for page in pdf.pages if page.extract_text()])
-               
-                general_details = extract_general_details(full_text)
-                all_general_details.append(general_details)
-               
-                table_3_1 = extract_table_3_1(pdf)
-                table_3_1["File Name"] = pdf_file.name
-                all_table_3_1.append(table_3_1)
-               
-                table_4 = extract_table_4(pdf)
-                table_4["File Name"] = pdf_file.name
-                all_table_4.append(table_4)
-               
-                table_6_1 = extract_table_6_1(pdf)
-                table_6_1["File Name"] = pdf_file.name
-                all_table_6_1.append(table_6_1)
-       
+    if session.keys:
         # 1) General Details
-        st.subheader("General Details")
-        general_df = pd.DataFrame(all_general_details)
-        st.dataframe(general_df)
-       
-        # Process but don't display these tables
-        final_table_3_1 = pd.concat(all_table_3_1, ignore_index=True)
-        final_table_4 = pd.concat(all_table_4, ignore_index=True)
-        final_table_6_1 = pd.concat(all_table_6_1, ignore_index=True)
-        
-        # Create combined data sheet
-        combined_df = create_combined_gstr3b_sheet(general_df, final_table_3_1, final_table_4, final_table_6_1)
+        if table_view == "Detail":
+            st.subheader("General Details")
+            general_view = paged_table("GSTR-3B general details", session.tables["General Details"].columns)
         
         # 2) Filters
         st.write("### Filter Data")
         
-        def multiselect_with_select_all(label, options):
-            selected = st.multiselect(label, ["Select All"] + options, default=["Select All"])
-            return options if "Select All" in selected else selected
-        
-        # Extract unique values for filters
-        months = general_df["Period"].dropna().unique().tolist()
-        states = [GST_STATE_CODES.get(gstin[:2], "Unknown") if gstin else "Unknown" 
-                 for gstin in general_df["GSTIN"].dropna().unique()]
-        gstins = general_df["GSTIN"].dropna().unique().tolist()
-        legal_names = general_df["Legal Name"].dropna().unique().tolist()
-        financial_years = general_df["Financial Year"].dropna().unique().tolist()
+        # One row per file; the filters select file IDs and every table is sliced by them
+        filter_columns = ["Period", "State", "GSTIN", "Legal Name", "Financial Year"]
+        dimension = build_file_dimension(session.tables["General Details"], session.file_keys("General Details"),
+                                         filter_columns)
+        selections = {
+            "Period": multiselect_with_select_all("Filter by Month", dimension["Period"].cat.categories.tolist()),
+            "State": multiselect_with_select_all("Filter by State", dimension["State"].cat.categories.tolist()),
+            "GSTIN": multiselect_with_select_all("Filter by GSTIN", dimension["GSTIN"].cat.categories.tolist()),
+            "Legal Name": multiselect_with_select_all("Filter by Legal Name", dimension["Legal Name"].cat.categories.tolist()),
+            "Financial Year": multiselect_with_select_all("Filter by Financial Year", dimension["Financial Year"].cat.categories.tolist()),
+        }
         
-        # Create filters
-        selected_month = multiselect_with_select_all("Filter by Month", months)
-        selected_state = multiselect_with_select_all("Filter by State", states)
-        selected_gstin = multiselect_with_select_all("Filter by GSTIN", gstins)
-        selected_legal_name = multiselect_with_select_all("Filter by Legal Name", legal_names)
-        selected_year = multiselect_with_select_all("Filter by Financial Year", financial_years)
+        if table_view == "Summary":
+            st.write("### Summary by GSTIN, Financial Year and Period")
+            summary_view = paged_table("GSTR-3B summary", GSTR3B_SUMMARY_COLUMNS, hide_index=True)
+            drill_down = drill_down_selectbox(dimension, selections, "Period")
+            drill_down_view = st.empty()
+        else:
+            # Filtered results in the order specified
+            st.write("### Filtered General Details")
+            filtered_general_view = paged_table("GSTR-3B filtered general details", session.tables["General Details"].columns)
+            st.write("### Filtered Table 3.1 - Outward and Reverse Charge Supplies")
+            filtered_3_1_view = paged_table("GSTR-3B filtered table 3.1", session.tables["Table 3.1"].columns)
+            st.write("### Filtered Table 4 - Eligible ITC")
+            filtered_4_view = paged_table("GSTR-3B filtered table 4", session.tables["Table 4"].columns)
+            st.write("### Filtered Table 6.1 - Payment of Tax")
+            filtered_6_1_view = paged_table("GSTR-3B filtered table 6.1", session.tables["Table 6.1"].columns)
+            st.write("### Filtered Combined GSTR-3B Data")
+            filtered_combined_view = paged_table("GSTR-3B filtered combined", session.tables["Combined"].columns)
         
-        # Apply filters to dataframes
-        filtered_general_df = general_df.copy()
-        filtered_table_3_1 = final_table_3_1.copy()
-        filtered_table_4 = final_table_4.copy()
-        filtered_table_6_1 = final_table_6_1.copy()
-        filtered_combined_df = combined_df.copy()
+        # Only filtered data is exported; the columnar formats carry GSTIN, year and
+        # period on every row instead of the combined sheet's presentation layout
+        partition_columns = ["GSTIN", "Financial Year", "Period"]
         
-        # Filter by Month (Period)
-        if selected_month:
-            filtered_general_df = filtered_general_df[filtered_general_df["Period"].isin(selected_month)]
-            file_names = filtered_general_df.index.tolist()
+        def draw_gstr3b():
+            general_df = session.tables["General Details"]
+            dimension = build_file_dimension(general_df, session.file_keys("General Details"), filter_columns)
+            file_mask = select_files(dimension, selections)
             
-            filtered_table_3_1 = filtered_table_3_1[filtered_table_3_1["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_table_4 = filtered_table_4[filtered_table_4["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_table_6_1 = filtered_table_6_1[filtered_table_6_1["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_combined_df = filtered_combined_df[filtered_combined_df["Period"].isin(selected_month)]
-        
-        # Filter by State (derived from GSTIN)
-        if selected_state:
-            state_gstins = []
-            for gstin in gstins:
-                if gstin and GST_STATE_CODES.get(gstin[:2], "Unknown") in selected_state:
-                    state_gstins.append(gstin)
+            def filtered(name, key_column=None):
+                table = session.tables[name] if key_column is None else session.with_keys(name, key_column)
+                return slice_by_files(table, session.file_keys(name), dimension, file_mask)
             
-            filtered_general_df = filtered_general_df[filtered_general_df["GSTIN"].isin(state_gstins)]
-            file_names = filtered_general_df.index.tolist()
+            filtered_general_df = filtered("General Details")
+            filtered_table_3_1 = filtered("Table 3.1")
+            filtered_table_4 = filtered("Table 4")
+            filtered_table_6_1 = filtered("Table 6.1")
+            filtered_combined_df = filtered("Combined")
             
-            filtered_table_3_1 = filtered_table_3_1[filtered_table_3_1["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_table_4 = filtered_table_4[filtered_table_4["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_table_6_1 = filtered_table_6_1[filtered_table_6_1["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_combined_df = filtered_combined_df[filtered_combined_df["GSTIN"].isin(state_gstins)]
-        
-        # Filter by GSTIN
-        if selected_gstin:
-            filtered_general_df = filtered_general_df[filtered_general_df["GSTIN"].isin(selected_gstin)]
-            file_names = filtered_general_df.index.tolist()
+            if table_view == "Summary":
+                # Files are matched and counted by key, as different files may share a name
+                summary_rows = gstr3b_summary_rows(filtered("General Details", "File Key"), {
+                    "Table 3.1": filtered("Table 3.1", "File Key"),
+                    "Table 4": filtered("Table 4", "File Key"),
+                    "Table 6.1": filtered("Table 6.1", "File Key"),
+                }, key_column="File Key")
+                summary_view(summarize_returns(summary_rows, "Period", GSTR3B_SUMMARY_COLUMNS[5:], key_column="File Key"))
+                show_drill_down(drill_down_view, drill_down, dimension, file_mask, "Period", session, {
+                    "General Details": "General Details",
+                    "Table 3.1 - Outward and Reverse Charge Supplies": "Table 3.1",
+                    "Table 4 - Eligible ITC": "Table 4",
+                    "Table 6.1 - Payment of Tax": "Table 6.1",
+                    "Combined GSTR-3B Data": "Combined",
+                })
+            else:
+                general_view(general_df)
+                filtered_general_view(filtered_general_df)
+                filtered_3_1_view(filtered_table_3_1)
+                filtered_4_view(filtered_table_4)
+                filtered_6_1_view(filtered_table_6_1)
+                filtered_combined_view(filtered_combined_df)
             
-            filtered_table_3_1 = filtered_table_3_1[filtered_table_3_1["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_table_4 = filtered_table_4[filtered_table_4["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_table_6_1 = filtered_table_6_1[filtered_table_6_1["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_combined_df = filtered_combined_df[filtered_combined_df["GSTIN"].isin(selected_gstin)]
-        
-        # Filter by Legal Name
-        if selected_legal_name:
-            filtered_general_df = filtered_general_df[filtered_general_df["Legal Name"].isin(selected_legal_name)]
-            file_names = filtered_general_df.index.tolist()
-            
-            filtered_table_3_1 = filtered_table_3_1[filtered_table_3_1["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_table_4 = filtered_table_4[filtered_table_4["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_table_6_1 = filtered_table_6_1[filtered_table_6_1["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_combined_df = filtered_combined_df[filtered_combined_df["Legal Name"].isin(selected_legal_name)]
-        
-        # Filter by Financial Year
-        if selected_year:
-            filtered_general_df = filtered_general_df[filtered_general_df["Financial Year"].isin(selected_year)]
-            file_names = filtered_general_df.index.tolist()
+            filtered_tables = {
+                "Filtered Combined Data": filtered_combined_df,
+                "Filtered General Details": filtered_general_df,
+                "Filtered Table 3.1": filtered_table_3_1,
+                "Filtered Table 4": filtered_table_4,
+                "Filtered Table 6.1": filtered_table_6_1,
+            }
             
-            filtered_table_3_1 = filtered_table_3_1[filtered_table_3_1["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_table_4 = filtered_table_4[filtered_table_4["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_table_6_1 = filtered_table_6_1[filtered_table_6_1["File Name"].isin(
-                [uploaded_files[i].name for i in file_names if i < len(uploaded_files)])]
-            filtered_combined_df = filtered_combined_df[filtered_combined_df["Financial Year"].isin(selected_year)]
-        
-        # Display filtered results in order specified
-        # 3) Filtered General Details
-        st.write("### Filtered General Details")
-        st.dataframe(filtered_general_df)
-        
-        # 4) Filtered Table 3.1
-        st.write("### Filtered Table 3.1 - Outward and Reverse Charge Supplies")
-        st.dataframe(filtered_table_3_1)
-        
-        # 5) Filtered Table 4
-        st.write("### Filtered Table 4 - Eligible ITC")
-        st.dataframe(filtered_table_4)
-        
-        # 6) Filtered Table 6.1
-        st.write("### Filtered Table 6.1 - Payment of Tax")
-        st.dataframe(filtered_table_6_1)
-        
-        # 7) Filtered Combined GSTR-3B Data
-        st.write("### Filtered Combined GSTR-3B Data")
-        st.dataframe(filtered_combined_df)
+            def columnar_tables():
+                # Details are matched by file key, as different files may share a name
+                keyed_general_df = filtered("General Details", "File Key")
+                return {"General Details": filtered_general_df, **{
+                    name: with_file_details(filtered(name, "File Key"), keyed_general_df, partition_columns,
+                                            key_column="File Key").drop(columns="File Key")
+                    for name in ["Table 3.1", "Table 4", "Table 6.1"]
+                }}
+            return filtered_tables, columnar_tables, ("GSTR-3B", tuple(dimension["File Key"]), file_mask.tobytes())
        
-        output_excel = "GSTR3B_Filtered.xlsx"
-        with pd.ExcelWriter(output_excel) as writer:
-            # Only write filtered data to the Excel file
-            filtered_combined_df.to_excel(writer, sheet_name="Filtered Combined Data", index=False)
-            filtered_general_df.to_excel(writer, sheet_name="Filtered General Details", index=False)
-            filtered_table_3_1.to_excel(writer, sheet_name="Filtered Table 3.1", index=False)
-            filtered_table_4.to_excel(writer, sheet_name="Filtered Table 4", index=False)
-            filtered_table_6_1.to_excel(writer, sheet_name="Filtered Table 6.1", index=False)
-       
-        with open(output_excel, "rb") as f:
-            st.download_button("Download Filtered Data", f, file_name="GSTR3B_Filtered.xlsx")
-
-
-
-
-
+        filtered_tables, columnar_tables, state_key = show_while_streaming(session, updates, draw_gstr3b)
+        show_performance_panel()
+        export_buttons("GSTR3B_Filtered", "Download Filtered Data", filtered_tables, columnar_tables, partition_columns,
+                       state_key)
 
+else:  # GSTR-1 vs GSTR-3B reconciliation
+    st.title("📄 GSTR-1 vs GSTR-3B Reconciliation")
+    st.write("Upload the GSTR-1 and GSTR-3B PDFs, or ZIP archives of them, to compare GSTR-1 Total Liability "
+             "with GSTR-3B Table 3.1 (a) + (b) for each GSTIN, financial year and period")
+   
+    gstr1_column, gstr3b_column = st.columns(2)
+    with gstr1_column:
+        gstr1_files = st.file_uploader("GSTR-1 returns", type=["pdf", "zip"], accept_multiple_files=True)
+    with gstr3b_column:
+        gstr3b_files = st.file_uploader("GSTR-3B returns", type=["pdf", "zip"], accept_multiple_files=True)
+    tolerance = st.number_input("Tolerance per amount (₹)", min_value=0.0, value=1.0, step=1.0)
+   
+    # Pairs can only be matched once both sides are parsed, so the streams are drained before drawing
+    gstr1_session = session_tables("GSTR-1")
+    gstr3b_session = session_tables("GSTR-3B")
+    for _ in stream_returns("GSTR-1", gstr1_files or [], gstr1_session, build_gstr1_tables):
+        pass
+    for _ in stream_returns("GSTR-3B", gstr3b_files or [], gstr3b_session, build_gstr3b_tables):
+        pass
+   
+    if gstr1_session.keys and gstr3b_session.keys:
+        # Recomputed only when either side's files or the tolerance change, not on every rerun
+        reconciliation_key = (gstr1_session.version, gstr3b_session.version, tolerance)
+        cached = st.session_state.get("reconciliation")
+        if cached is None or cached[0] != reconciliation_key:
+            with performance_log.activate():
+                # Returns are matched and counted by file key, as different files may share a name
+                reconciliation = reconcile_returns(gstr1_session.with_keys("Total Liability"),
+                                                   gstr3b_session.with_keys("General Details"),
+                                                   gstr3b_session.with_keys("Table 3.1"), tolerance, key_column="File Key")
+            st.session_state["reconciliation"] = cached = (reconciliation_key, reconciliation)
+        reconciliation = cached[1]
+       
+        status_counts = reconciliation["Status"].value_counts()
+        for status_column, status in zip(st.columns(len(RECONCILIATION_STATUSES)), RECONCILIATION_STATUSES):
+            status_column.metric(status, int(status_counts.get(status, 0)))
+       
+        selected_statuses = st.multiselect("Show pairs", RECONCILIATION_STATUSES,
+                                           default=[status for status in RECONCILIATION_STATUSES if status != "Matched"])
+        filtered_reconciliation = reconciliation[reconciliation["Status"].isin(selected_statuses)]
+        st.write(f"### Reconciliation ({len(filtered_reconciliation)} of {len(reconciliation)} pairs)")
+        paged_table("reconciliation", reconciliation.columns, hide_index=True)(filtered_reconciliation)
+       
+        show_performance_panel()
+        export_buttons(
+            "GSTR1_vs_GSTR3B", "Download Reconciliation as Excel", {"Reconciliation": filtered_reconciliation},
+            lambda: {"Reconciliation": filtered_reconciliation},
+            RECONCILIATION_KEYS,
+            ("Reconciliation", reconciliation_key, tuple(selected_statuses)),
+        )
+    else:
+        st.info("Upload returns of both types to reconcile them.")
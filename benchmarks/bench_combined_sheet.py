@@ -0,0 +1,71 @@
+"""
+Benchmark create_combined_gstr3b_sheet on synthetic GSTR-3B frames.
+
+Usage:
+    python benchmarks/bench_combined_sheet.py [--files 1000 5000] [--repeat N]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import gst_extractor  # noqa: E402
+
+
+def synthetic_frames(file_count):
+    """General details plus Table 3.1 / 4 / 6.1 frames shaped like the extractor output."""
+    file_names = [f"return_{i:05d}.pdf" for i in range(file_count)]
+    general_df = pd.DataFrame({
+        "File Name": file_names,
+        "GSTIN": [f"27ABCDE{i:04d}F1Z5" for i in range(file_count)],
+        "State": "Maharashtra",
+        "Legal Name": [f"Company {i % 97}" for i in range(file_count)],
+        "Date": "20/05/2023",
+        "Financial Year": "2023-24",
+        "Period": [["April", "May", "June"][i % 3] for i in range(file_count)],
+    })
+
+    def table(description_column, descriptions, amount_columns):
+        rows = len(descriptions)
+        frame = pd.DataFrame({
+            description_column: descriptions * file_count,
+            "File Name": [name for name in file_names for _ in range(rows)],
+        })
+        for column in amount_columns:
+            frame[column] = [float(i % 1000) for i in range(len(frame))]
+        return frame
+
+    table_3_1_df = table("Nature of Supplies", [f"({c}) supplies" for c in "abcde"],
+                         ["Total Taxable Value", "Integrated Tax", "Central Tax", "State/UT Tax", "Cess"])
+    table_4_df = table("Details", [f"ITC row {i}" for i in range(13)],
+                       ["Integrated Tax", "Central Tax", "State/UT Tax", "Cess"])
+    table_6_1_df = table("Description", ["Integrated Tax", "Central Tax", "State/UT Tax", "Cess"],
+                         ["Total Tax Payable", "Tax Paid Through ITC", "Tax Paid in Cash",
+                          "Interest Paid in Cash", "Late Fee Paid in Cash"])
+    return general_df, table_3_1_df, table_4_df, table_6_1_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, nargs="+", default=[1000, 2000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for file_count in args.files:
+        frames = synthetic_frames(file_count)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            combined = gst_extractor.create_combined_gstr3b_sheet(*frames)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f"{file_count:6d} files  {len(combined):8d} rows  {best * 1000:8.1f} ms  "
+              f"({best / file_count * 1e6:.1f} us/file)")
+
+
+if __name__ == "__main__":
+    main()
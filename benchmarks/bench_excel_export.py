@@ -0,0 +1,73 @@
+"""
+Benchmark Excel export of a large combined GSTR-3B sheet: time and peak RSS of
+the streaming in-memory writer (write_excel) against pandas.to_excel through
+openpyxl. Each measurement runs in a fresh process so peak RSS is not shared.
+openpyxl is only needed here: pip install -r benchmarks/requirements.txt
+
+Usage:
+    python benchmarks/bench_excel_export.py [--rows 100000]
+"""
+import argparse
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Combined sheet rows per synthetic file (FILE INFO + 5 + 13 + 4 + separator)
+ROWS_PER_FILE = 24
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode, rows):
+    import gst_extractor
+    from bench_combined_sheet import synthetic_frames
+
+    combined = gst_extractor.create_combined_gstr3b_sheet(*synthetic_frames(max(1, rows // ROWS_PER_FILE)))
+    baseline_rss = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == "streaming":
+        size = len(gst_extractor.write_excel({"Filtered Combined Data": combined}))
+    else:
+        import pandas as pd
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+            combined.to_excel(writer, sheet_name="Filtered Combined Data", index=False)
+        size = len(buffer.getvalue())
+    elapsed = time.perf_counter() - start
+
+    return {"mode": mode, "rows": len(combined), "seconds": elapsed, "bytes": size,
+            "peak_rss_mb": peak_rss_mb(), "rss_growth_mb": peak_rss_mb() - baseline_rss}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--mode", choices=["streaming", "openpyxl"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.rows)))
+        return
+
+    for mode in ("streaming", "openpyxl"):
+        output = subprocess.run([sys.executable, __file__, "--rows", str(args.rows), "--mode", mode],
+                                capture_output=True, text=True, check=True)
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"{result['mode']:10s} {result['rows']:8d} rows  {result['seconds']:7.2f} s  "
+              f"{result['bytes'] / 1e6:6.1f} MB xlsx  peak RSS {result['peak_rss_mb']:7.1f} MB "
+              f"(+{result['rss_growth_mb']:.1f} MB during export)")
+
+
+if __name__ == "__main__":
+    main()
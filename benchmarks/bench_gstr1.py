@@ -0,0 +1,58 @@
+"""
+Benchmark the single-pass GSTR-1 extractor against the previous three-pass flow.
+
+Usage:
+    python benchmarks/bench_gstr1.py path/to/gstr1_a.pdf path/to/gstr1_b.pdf ... [--repeat N]
+"""
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import gst_extractor  # noqa: E402
+
+
+def three_pass(pdf_bytes):
+    # The pre-existing flow: pdfplumber for the header, two more PyMuPDF passes for the totals
+    return {
+        "details": gst_extractor.extract_details(io.BytesIO(pdf_bytes)),
+        "total_liability": gst_extractor.extract_total_liability(pdf_bytes),
+        "tables_4A_4B": gst_extractor.extract_tables_4A_4B(pdf_bytes),
+    }
+
+
+def time_per_file(extractor, documents, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for pdf_bytes in documents:
+            extractor(pdf_bytes)
+    return (time.perf_counter() - start) / (repeat * len(documents))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+", type=Path)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    documents = [path.read_bytes() for path in args.pdfs]
+
+    mismatches = [path.name for path, pdf_bytes in zip(args.pdfs, documents)
+                  if three_pass(pdf_bytes) != gst_extractor.extract_gstr1(pdf_bytes)]
+
+    old = time_per_file(three_pass, documents, args.repeat)
+    new = time_per_file(gst_extractor.extract_gstr1, documents, args.repeat)
+
+    print(f"files: {len(documents)}  repeat: {args.repeat}")
+    print(f"three-pass:  {old * 1000:8.2f} ms/file")
+    print(f"single-pass: {new * 1000:8.2f} ms/file")
+    print(f"speedup:     {old / new:8.2f}x")
+    if mismatches:
+        print(f"output differs for: {', '.join(mismatches)}")
+
+
+if __name__ == "__main__":
+    main()
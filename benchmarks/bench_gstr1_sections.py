@@ -0,0 +1,75 @@
+"""
+Worst-case benchmark for the GSTR-1 Table 4A/4B parser.
+
+Builds synthetic document text in which the 4A/4B "Total ... Invoice" lines are
+missing or malformed and followed by many other tables. It then compares the
+previous whole-document DOTALL search with parse_tables_4A_4B, which only
+searches between each heading and the next table heading.
+
+Usage:
+    python benchmarks/bench_gstr1_sections.py [--rows N] [--repeat N]
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import gst_extractor  # noqa: E402
+
+LEGACY_TOTAL = r".*?Total\s+(\d+)\s+Invoice\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)"
+LEGACY_4A = "4A - Taxable outward supplies made to registered persons" + LEGACY_TOTAL
+LEGACY_4B = "4B - Taxable outward supplies made to registered persons attracting tax on reverse charge" + LEGACY_TOTAL
+
+
+def legacy_parse(text):
+    # The previous implementation: two uncompiled DOTALL searches over the whole text
+    return re.search(LEGACY_4A, text, re.DOTALL), re.search(LEGACY_4B, text, re.DOTALL)
+
+
+def synthetic_text(rows, with_totals):
+    # "Total <n> Invoice" lines with too few amounts keep the legacy pattern backtracking
+    malformed = "\n".join(f"Total {i} Invoice {i},000.00 0.00" for i in range(rows))
+    lines = [
+        "Form GSTR-1",
+        "4A - Taxable outward supplies made to registered persons (other than reverse charge supplies)",
+        malformed,
+        "Total 12 Invoice 50,000.00 9,000.00 0.00 0.00 0.00" if with_totals else "",
+        "4B - Taxable outward supplies made to registered persons attracting tax on reverse charge",
+        malformed,
+        "Total 3 Invoice 5,000.00 900.00 0.00 0.00 0.00" if with_totals else "",
+    ]
+    for table in ["5", "6A", "6B", "6C", "7", "8", "9A", "9B", "11A", "12", "13"]:
+        lines.append(f"{table} - Other table")
+        lines.append(malformed)
+    return "\n".join(lines)
+
+
+def best_of(function, text, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="Malformed total lines per table")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for with_totals in (False, True):
+        text = synthetic_text(args.rows, with_totals)
+        legacy = best_of(legacy_parse, text, args.repeat)
+        anchored = best_of(gst_extractor.parse_tables_4A_4B, text, args.repeat)
+        label = "totals present" if with_totals else "totals missing"
+        print(f"{label:15s} {len(text) / 1e6:6.2f} MB text  legacy {legacy * 1000:9.2f} ms  "
+              f"anchored {anchored * 1000:8.2f} ms  ({legacy / anchored:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
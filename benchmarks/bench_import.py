@@ -0,0 +1,45 @@
+"""
+Measure the cold import time of the gst_extractor library against the imports
+the Streamlit app needs at startup (streamlit, PyMuPDF, pdfplumber, pandas).
+
+Each measurement runs in a fresh interpreter so nothing is already imported.
+
+Usage:
+    python benchmarks/bench_import.py [--repeat N]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+CASES = {
+    "gst_extractor": "import gst_extractor",
+    "app startup imports": "import streamlit, fitz, pdfplumber, pandas, gst_extractor",
+}
+
+
+def cold_import_seconds(statement):
+    code = f"import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    medians = {}
+    for name, statement in CASES.items():
+        medians[name] = statistics.median(cold_import_seconds(statement) for _ in range(args.repeat))
+        print(f"{name:22s} {medians[name] * 1000:8.1f} ms (median of {args.repeat})")
+
+    ratio = medians["app startup imports"] / medians["gst_extractor"]
+    print(f"library import is {ratio:.1f}x faster than the app's startup imports")
+
+
+if __name__ == "__main__":
+    main()
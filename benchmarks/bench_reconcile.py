@@ -0,0 +1,94 @@
+"""
+Benchmark for the GSTR-1 vs GSTR-3B reconciliation.
+
+Builds session-style tables for --pairs return pairs (GSTR-1 Total Liability
+rows, GSTR-3B General Details and five Table 3.1 rows per return), with a share
+of mismatched amounts and of returns filed on one side only, then times
+reconcile_returns and reports pairs/sec and the status counts.
+
+Usage:
+    python benchmarks/bench_reconcile.py                   # 10,000 pairs
+    python benchmarks/bench_reconcile.py --pairs 100000 --repeat 3
+"""
+import argparse
+import random
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import gst_extractor  # noqa: E402
+from gst_extractor import pd  # noqa: E402
+from synthetic_returns import MONTHS, TABLE_3_1_ROWS, random_gstin  # noqa: E402
+
+GSTR1_AMOUNTS = ["Taxable Value", "IGST", "CGST", "SGST", "Cess"]
+GSTR3B_AMOUNTS = ["Total Taxable Value", "Integrated Tax", "Central Tax", "State/UT Tax", "Cess"]
+
+
+def paise(rng, high=10_000_000):
+    return Decimal(rng.randint(0, high * 100)).scaleb(-2)
+
+
+def reconciliation_tables(pairs, mismatch=0.1, unmatched=0.02, seed=0):
+    """(gstr1_liability, gstr3b_details, gstr3b_table_3_1) DataFrames for about `pairs` return pairs."""
+    rng = random.Random(seed)
+    liability, details, table_3_1 = [], [], []
+    gstins = [random_gstin(rng) for _ in range(max(1, pairs // 12))]
+    for number in range(pairs):
+        gstin = gstins[number // 12 % len(gstins)]
+        year = f"{2019 + number // (12 * len(gstins))}-{(20 + number // (12 * len(gstins))) % 100:02d}"
+        month = MONTHS[number % 12]
+        outward = [paise(rng) for _ in range(5)]
+        zero_rated = [paise(rng, 100_000) for _ in range(5)]
+        gstr1 = [a + b for a, b in zip(outward, zero_rated)]
+        if rng.random() < mismatch:
+            gstr1[rng.randrange(5)] = paise(rng)
+        side = rng.random()
+        if side >= unmatched / 2:
+            liability.append([f"gstr1_{number:06d}.pdf", gstin, "", "LEGAL NAME", month, year] + gstr1)
+        if side < unmatched / 2 or side >= unmatched:
+            file_name = f"gstr3b_{number:06d}.pdf"
+            details.append([file_name, gstin, "", "LEGAL NAME", "", year, month])
+            for label, amounts in zip(TABLE_3_1_ROWS, [outward, zero_rated] + [[paise(rng)] * 5] * 3):
+                table_3_1.append([label] + amounts + [file_name])
+
+    gstr1_liability = pd.DataFrame(liability, columns=["File Name", "GSTIN", "State", "Legal Name", "Month",
+                                                       "Financial Year"] + GSTR1_AMOUNTS)
+    gstr3b_details = pd.DataFrame(details, columns=["File Name", "GSTIN", "State", "Legal Name", "Date",
+                                                    "Financial Year", "Period"])
+    gstr3b_table_3_1 = pd.DataFrame(table_3_1, columns=["Nature of Supplies"] + GSTR3B_AMOUNTS + ["File Name"])
+    # Amounts as the app holds them: exact decimals
+    return (gst_extractor.parse_amount_columns(gstr1_liability, GSTR1_AMOUNTS),
+            gstr3b_details,
+            gst_extractor.parse_amount_columns(gstr3b_table_3_1, GSTR3B_AMOUNTS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=10_000, help="Return pairs to reconcile")
+    parser.add_argument("--mismatch", type=float, default=0.1, help="Share of pairs with a differing amount")
+    parser.add_argument("--unmatched", type=float, default=0.02, help="Share of returns filed on one side only")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="Rupees a difference may be off by")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    tables = reconciliation_tables(args.pairs, args.mismatch, args.unmatched, args.seed)
+    print(f"Built tables for {args.pairs} pairs in {time.perf_counter() - start:.2f} s")
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = gst_extractor.reconcile_returns(*tables, tolerance=args.tolerance)
+        best = min(best, time.perf_counter() - start)
+    print(f"reconcile_returns: {best:.3f} s best of {args.repeat} ({args.pairs / best:,.0f} pairs/sec)")
+    for status, count in result["Status"].value_counts().items():
+        print(f"  {status:20s} {count:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark for the extraction cache shared by the sessions of one app process.
+
+Generates a pool of GSTR-3B returns, then runs --sessions threads at once, each
+extracting --uploads returns drawn from the pool (so sessions upload many of
+the same returns, as staff working on the same clients do). This is run once
+with a cache per session and once with one ExtractionCache shared by all of
+them under a --cache-mb budget, reporting wall time, files actually parsed,
+and the shared cache's hits, misses, waits, evictions and memory held.
+
+Usage:
+    python benchmarks/bench_shared_cache.py                        # 20 sessions
+    python benchmarks/bench_shared_cache.py --sessions 40 --pool 200 --cache-mb 1
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import gst_extractor  # noqa: E402
+from synthetic_returns import gstr3b_pdf  # noqa: E402
+
+
+def run_sessions(pool, sessions, uploads, shared_cache=None, seed=0):
+    """Wall seconds and files parsed for `sessions` concurrent sessions; each gets its own cache unless shared_cache."""
+    rng = random.Random(seed)
+    batches = [rng.sample(range(len(pool)), min(uploads, len(pool))) for _ in range(sessions)]
+    caches = [shared_cache or gst_extractor.ExtractionCache() for _ in range(sessions)]
+    parsed = []
+
+    def session(batch, cache):
+        files = [(f"gstr3b_{number:05d}.pdf", pool[number]) for number in batch]
+        performance = gst_extractor.PerformanceLog()
+        for _, result, error in gst_extractor.iter_extract_files("GSTR-3B", files, cache=cache, max_workers=1,
+                                                                 performance=performance):
+            assert error is None, error
+        parsed.append(len(performance.files))
+
+    threads = [threading.Thread(target=session, args=(batch, cache)) for batch, cache in zip(batches, caches)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sum(parsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent sessions")
+    parser.add_argument("--uploads", type=int, default=10, help="Returns uploaded by each session")
+    parser.add_argument("--pool", type=int, default=40, help="Distinct returns the uploads are drawn from")
+    parser.add_argument("--cache-mb", type=float, default=512, help="Memory budget of the shared cache")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    pool = [gstr3b_pdf(rng) for _ in range(args.pool)]
+    print(f"Generated {args.pool} GSTR-3B returns in {time.perf_counter() - start:.2f} s")
+
+    seconds, parsed = run_sessions(pool, args.sessions, args.uploads, seed=args.seed)
+    print(f"Per-session caches: {seconds:6.2f} s, {parsed} files parsed")
+
+    shared_cache = gst_extractor.ExtractionCache(max_bytes=int(args.cache_mb * 1e6))
+    seconds, parsed = run_sessions(pool, args.sessions, args.uploads, shared_cache, seed=args.seed)
+    stats = shared_cache.stats()
+    print(f"Shared cache:       {seconds:6.2f} s, {parsed} files parsed")
+    print(f"  {stats['hits']} hits, {stats['misses']} misses ({stats['waits']} waited for another session), "
+          f"{stats['evictions']} evictions; "
+          f"{stats['entries']} results in {stats['bytes'] / 1e6:.2f} MB of {args.cache_mb:g} MB")
+
+
+if __name__ == "__main__":
+    main()
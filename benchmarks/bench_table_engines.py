@@ -0,0 +1,130 @@
+"""
+Accuracy parity and throughput of the GSTR-3B table engines.
+
+Extracts every GSTR-3B return in a corpus with each table engine in
+gst_extractor.TABLE_ENGINES, compares the general details and Tables 3.1, 4
+and 6.1 of every engine against pdfplumber's cell by cell, and reports each
+engine's files/sec. Exits with status 1 if any cell differs. Generated returns
+rule a --curves fraction of their table cells with Bezier curves, which
+pdfplumber turns into table edges too.
+
+Usage:
+    python benchmarks/bench_table_engines.py                        # generate a corpus
+    python benchmarks/bench_table_engines.py --corpus returns/ --paged
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import gst_extractor  # noqa: E402
+from gst_extractor import pd  # noqa: E402
+from synthetic_returns import generate_corpus  # noqa: E402
+
+TABLES = ["table_3_1", "table_4", "table_6_1"]
+REFERENCE_ENGINE = "pdfplumber"
+
+
+def _same(left, right):
+    if pd.isna(left) and pd.isna(right):
+        return True
+    return left == right
+
+
+def compare_results(reference, candidate):
+    """(section, row, column, reference value, candidate value) for every cell that differs."""
+    differences = []
+    for key in reference["general_details"].keys() | candidate["general_details"].keys():
+        expected = reference["general_details"].get(key)
+        actual = candidate["general_details"].get(key)
+        if expected != actual:
+            differences.append(("general_details", None, key, expected, actual))
+
+    for table in TABLES:
+        expected, actual = reference[table], candidate[table]
+        if list(expected.columns) != list(actual.columns):
+            differences.append((table, None, "columns", list(expected.columns), list(actual.columns)))
+            continue
+        for row in range(max(len(expected), len(actual))):
+            if row >= len(expected) or row >= len(actual):
+                differences.append((table, row, "row", row < len(expected), row < len(actual)))
+                continue
+            for column in expected.columns:
+                if not _same(expected[column].iloc[row], actual[column].iloc[row]):
+                    differences.append((table, row, column, expected[column].iloc[row], actual[column].iloc[row]))
+    return differences
+
+
+def run(documents, repeat, paged):
+    """({engine: files/sec}, {engine: [(file, differences)]}) over the (name, pdf_bytes) documents."""
+    results = {}
+    throughput = {}
+    for engine in gst_extractor.TABLE_ENGINES:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            results[engine] = [gst_extractor.process_gstr3b_file(pdf_bytes, paged=paged, engine=engine)
+                               for _, pdf_bytes in documents]
+        throughput[engine] = repeat * len(documents) / (time.perf_counter() - start)
+
+    mismatches = {}
+    for engine in gst_extractor.TABLE_ENGINES:
+        if engine == REFERENCE_ENGINE:
+            continue
+        mismatches[engine] = []
+        for (name, _), reference, candidate in zip(documents, results[REFERENCE_ENGINE], results[engine]):
+            differences = compare_results(reference, candidate)
+            if differences:
+                mismatches[engine].append((name, differences))
+    return throughput, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, help="Directory of GSTR-3B PDFs (gstr3b_*.pdf; default: generate)")
+    parser.add_argument("--files", type=int, default=20, help="Returns to generate")
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--curves", type=float, default=0.2, help="Fraction of generated table cells ruled with curves")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--paged", action="store_true", help="Extract in the memory-bounded, page-at-a-time mode")
+    parser.add_argument("--show", type=int, default=20, help="Differing cells to print per engine")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus = args.corpus
+        if corpus is None:
+            corpus = Path(temp_dir)
+            generate_corpus(corpus, 0, args.files, args.pages, args.noise, args.seed, args.curves)
+        documents = [(path.name, path.read_bytes()) for path in sorted(corpus.glob("gstr3b_*.pdf"))]
+    if not documents:
+        parser.error(f"no gstr3b_*.pdf files in {corpus}")
+
+    throughput, mismatches = run(documents, args.repeat, args.paged)
+    print(f"GSTR-3B ({len(documents)} files x {args.repeat}{', paged' if args.paged else ''})")
+    for engine, files_per_sec in throughput.items():
+        speedup = files_per_sec / throughput[REFERENCE_ENGINE]
+        print(f"  {engine:12s} {files_per_sec:10.2f} files/sec  {speedup:6.2f}x")
+
+    failed = False
+    for engine, files in mismatches.items():
+        cells = sum(len(differences) for _, differences in files)
+        print(f"{engine} vs {REFERENCE_ENGINE}: {len(files)} of {len(documents)} files differ ({cells} cells)")
+        shown = 0
+        for name, differences in files:
+            for table, row, column, expected, actual in differences:
+                if shown < args.show:
+                    print(f"  {name} {table} row {row} {column}: {expected!r} != {actual!r}")
+                    shown += 1
+        failed = failed or bool(files)
+    if failed:
+        sys.exit(1)
+    print("All engines match cell for cell")
+
+
+if __name__ == "__main__":
+    main()
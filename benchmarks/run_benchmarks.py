@@ -0,0 +1,156 @@
+"""
+Benchmark harness for the GSTR-1 / GSTR-3B extractors.
+
+Generates (or reuses) a synthetic corpus, then reports per-stage and end-to-end
+files/sec, time to the first streamed result and peak memory for each return
+type, with GSTR-3B timed once per table engine (--engine for just one). With --baseline, exits with status 1 if end-to-end (or, with
+--check-stages, per-stage) throughput falls more than --max-regression below
+the saved baseline.
+
+Usage:
+    python benchmarks/run_benchmarks.py                           # generate corpus, print report
+    python benchmarks/run_benchmarks.py --save baseline.json      # record a baseline
+    python benchmarks/run_benchmarks.py --baseline baseline.json --max-regression 0.2
+    python benchmarks/run_benchmarks.py --engine pymupdf          # GSTR-3B with PyMuPDF tables only
+"""
+import argparse
+import json
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import gst_extractor  # noqa: E402
+from synthetic_returns import generate_corpus  # noqa: E402
+
+
+def benchmark_return_type(return_type, documents, repeat, workers, table_engine=None):
+    """
+    Files/sec per stage and end to end, seconds until iter_extract_files yields
+    its first result, and the peak Python heap (tracemalloc) for one file.
+    Stages are the library's own stage() blocks, timed by extract_with_timings
+    exactly as for the app's performance panel. table_engine is passed through
+    to the GSTR-3B extractor.
+    """
+    results = {}
+
+    # One untimed file first, so one-time imports and warm-up land in no engine's numbers
+    gst_extractor.extract_with_timings(return_type, documents[0], table_engine=table_engine)
+    totals = gst_extractor.StageTimer()
+    seconds = 0.0
+    for _ in range(repeat):
+        for pdf_bytes in documents:
+            _, file_seconds, stages, _ = gst_extractor.extract_with_timings(return_type, pdf_bytes,
+                                                                            table_engine=table_engine)
+            totals.merge(stages)
+            seconds += file_seconds
+    file_count = repeat * len(documents)
+    for stage, stage_seconds in totals.seconds.items():
+        results[f"stage: {stage}"] = file_count / stage_seconds if stage_seconds else float("inf")
+    results["end to end"] = file_count / seconds
+
+    files = [(str(number), pdf_bytes) for number, pdf_bytes in enumerate(documents)]
+    start = time.perf_counter()
+    outcomes = gst_extractor.iter_extract_files(return_type, files, max_workers=workers,
+                                                 table_engine=table_engine)
+    next(outcomes)
+    first_result = time.perf_counter() - start
+    outcomes.close()
+
+    if workers > 1:
+        start = time.perf_counter()
+        gst_extractor.extract_files(return_type, files, max_workers=workers, table_engine=table_engine)
+        results[f"batch ({workers} workers)"] = len(documents) / (time.perf_counter() - start)
+
+    options = {"engine": table_engine} if return_type == "GSTR-3B" else {}
+    tracemalloc.start()
+    gst_extractor.EXTRACTORS[return_type](max(documents, key=len), **options)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return results, first_result, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, help="Directory of gstr1_*.pdf / gstr3b_*.pdf (default: generate)")
+    parser.add_argument("--files", type=int, default=20, help="Returns of each type to generate")
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=1, help="Also time extract_files with this many workers")
+    parser.add_argument("--engine", choices=gst_extractor.TABLE_ENGINES,
+                        help="Time GSTR-3B with this table engine only (default: each in turn)")
+    parser.add_argument("--save", type=Path, help="Write results as a JSON baseline")
+    parser.add_argument("--baseline", type=Path, help="Compare against a saved baseline")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed fractional drop in files/sec versus the baseline (default 0.2)")
+    parser.add_argument("--check-stages", action="store_true",
+                        help="Also fail on per-stage regressions (noisy for the sub-millisecond regex stages)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus = args.corpus
+        if corpus is None:
+            corpus = Path(temp_dir)
+            generate_corpus(corpus, args.files, args.files, args.pages, args.noise, args.seed)
+        corpora = {
+            "GSTR-1": [path.read_bytes() for path in sorted(corpus.glob("gstr1_*.pdf"))],
+            "GSTR-3B": [path.read_bytes() for path in sorted(corpus.glob("gstr3b_*.pdf"))],
+        }
+
+    # Report keys: the pdfplumber run keeps the plain "GSTR-3B" key so older baselines still compare
+    runs = [("GSTR-1", "GSTR-1", None)]
+    for engine in [args.engine] if args.engine else gst_extractor.TABLE_ENGINES:
+        runs.append(("GSTR-3B" if engine == "pdfplumber" else f"GSTR-3B ({engine})", "GSTR-3B", engine))
+
+    report = {}
+    for name, return_type, engine in runs:
+        documents = corpora[return_type]
+        if not documents:
+            continue
+        throughput, first_result, peak = benchmark_return_type(return_type, documents, args.repeat, args.workers,
+                                                               engine)
+        report[name] = {"files_per_sec": throughput, "first_result_seconds": first_result,
+                        "peak_python_heap_mb": peak / 1e6}
+        print(f"{name} ({len(documents)} files x {args.repeat})")
+        for name, files_per_sec in throughput.items():
+            print(f"  {name:28s} {files_per_sec:10.1f} files/sec")
+        print(f"  {'first result':28s} {first_result:10.3f} s")
+        print(f"  {'peak Python heap (1 file)':28s} {peak / 1e6:10.1f} MB")
+    # ru_maxrss is in kilobytes on Linux
+    report["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"process peak RSS {report['peak_rss_mb']:.1f} MB")
+
+    if args.save:
+        args.save.write_text(json.dumps(report, indent=2))
+        print(f"Saved baseline to {args.save}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = []
+        for return_type, results in report.items():
+            if return_type not in baseline or not isinstance(results, dict):
+                continue
+            for name, files_per_sec in results["files_per_sec"].items():
+                if name.startswith("stage:") and not args.check_stages:
+                    continue
+                expected = baseline[return_type]["files_per_sec"].get(name)
+                if expected and files_per_sec < expected * (1 - args.max_regression):
+                    regressions.append(f"{return_type} {name}: {files_per_sec:.1f} files/sec "
+                                       f"(baseline {expected:.1f})")
+        if regressions:
+            print(f"Throughput regressed by more than {args.max_regression:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No throughput regression beyond {args.max_regression:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Generate synthetic GSTR-1 and GSTR-3B PDFs for benchmarking.
+
+The documents carry the headings, labels and table layouts that the extractors
+in gst_extractor look for (header fields, Total Liability, Tables 4A/4B, and
+ruled Tables 3.1, 4 and 6.1), filled with random but well-formed values.
+--pages pads each return with continuation pages of ruled filler tables, and
+--noise adds stray text lines and position jitter.
+
+Usage:
+    python benchmarks/synthetic_returns.py out_dir [--gstr1 N] [--gstr3b N] [--pages N] [--noise 0.2] [--seed 0]
+"""
+import argparse
+import random
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+STATE_CODES = ["07", "09", "19", "24", "27", "29", "33", "36"]
+MONTHS = ["April", "May", "June", "July", "August", "September", "October", "November",
+          "December", "January", "February", "March"]
+FONT_SIZE = 7
+
+TABLE_3_1_ROWS = [
+    "(a) Outward taxable supplies (other than zero rated, nil rated and exempted)",
+    "(b) Outward taxable supplies (zero rated)",
+    "(c) Other outward supplies (nil rated, exempted)",
+    "(d) Inward supplies (liable to reverse charge)",
+    "(e) Non-GST outward supplies",
+]
+TABLE_4_ROWS = [
+    "A. ITC Available (whether in full or part)",
+    "(1) Import of goods",
+    "(2) Import of services",
+    "(3) Inward supplies liable to reverse charge (other than 1 & 2 above)",
+    "(4) Inward supplies from ISD",
+    "(5) All other ITC",
+    "B. ITC Reversed",
+    "(1) As per rules 38,42 & 43 of CGST Rules and section 17(5)",
+    "(2) Others",
+    "C. Net ITC available (A-B)",
+    "D. Other Details",
+    "(1) ITC reclaimed which was reversed under Table 4(B)(2) in earlier tax period",
+    "(2) Ineligible ITC under section 16(4) & ITC restricted due to PoS rules",
+]
+TABLE_6_1_ROWS = ["Integrated Tax", "Central Tax", "State/UT Tax", "Cess"]
+
+
+def amount(rng, high=10_000_000):
+    """Random amount formatted the Indian way, e.g. 12,34,567.89."""
+    value = rng.randint(0, high * 100)
+    rupees, paise = divmod(value, 100)
+    digits = str(rupees)
+    if len(digits) > 3:
+        head, tail = digits[:-3], digits[-3:]
+        groups = []
+        while len(head) > 2:
+            groups.insert(0, head[-2:])
+            head = head[:-2]
+        if head:
+            groups.insert(0, head)
+        digits = ",".join(groups + [tail])
+    return f"{digits}.{paise:02d}"
+
+
+def random_gstin(rng):
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    pan = "".join(rng.choice(letters) for _ in range(5)) + f"{rng.randint(0, 9999):04d}" + rng.choice(letters)
+    return f"{rng.choice(STATE_CODES)}{pan}1Z{rng.randint(1, 9)}"
+
+
+def random_header(rng):
+    start_year = rng.randint(2019, 2025)
+    return {
+        "gstin": random_gstin(rng),
+        "legal_name": f"{rng.choice(['ACME', 'SHREE', 'GLOBAL', 'NEW INDIA', 'SUNRISE'])} "
+                      f"{rng.choice(['TRADERS', 'INDUSTRIES', 'ENTERPRISES', 'EXPORTS'])} PRIVATE LIMITED",
+        "financial_year": f"{start_year}-{(start_year + 1) % 100:02d}",
+        "month": rng.choice(MONTHS),
+        "arn_date": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{start_year + 1}",
+    }
+
+
+class PageWriter:
+    """Writes lines and ruled tables top to bottom, starting new pages as needed."""
+
+    def __init__(self, doc, rng, noise, curves=0.0):
+        self.doc = doc
+        self.rng = rng
+        self.noise = noise
+        self.curves = curves
+        self.new_page()
+
+    def new_page(self):
+        self.page = self.doc.new_page()
+        self.y = 40
+
+    def ensure_space(self, height):
+        if self.y + height > self.page.rect.height - 40:
+            self.new_page()
+
+    def jitter(self):
+        return self.rng.uniform(-1.5, 1.5) if self.noise else 0.0
+
+    def maybe_noise_line(self):
+        if self.rng.random() < self.noise:
+            self.line(f"Note: {self.rng.choice(['system generated', 'subject to verification', 'figures in INR'])} "
+                      f"{self.rng.randint(1000, 99999)}", noise=False)
+
+    def line(self, text, noise=True):
+        self.ensure_space(14)
+        self.page.insert_text((40 + self.jitter(), self.y), text, fontsize=FONT_SIZE)
+        self.y += 12
+        if noise:
+            self.maybe_noise_line()
+
+    def table(self, rows, widths, row_height=16):
+        """Ruled grid, so pdfplumber's line-based table finder detects it."""
+        self.ensure_space(row_height * min(len(rows), 4))
+        for row in rows:
+            self.ensure_space(row_height)
+            x = 40
+            for width, cell in zip(widths, row):
+                rect = fitz.Rect(x, self.y, x + width, self.y + row_height)
+                if self.curves and self.rng.random() < self.curves:
+                    self.curved_rect(rect)
+                else:
+                    self.page.draw_rect(rect, color=(0, 0, 0), width=0.5)
+                self.page.insert_textbox(rect + (2, 2, -2, -1), cell, fontsize=FONT_SIZE - 1)
+                x += width
+            self.y += row_height
+        self.y += 10
+
+    def curved_rect(self, rect):
+        """Cell border drawn as four straight Bezier curves, as some PDF producers draw rulings."""
+        corners = [rect.tl, rect.tr, rect.br, rect.bl, rect.tl]
+        for start, end in zip(corners, corners[1:]):
+            self.page.draw_bezier(start, start + (end - start) / 3, start + (end - start) * 2 / 3, end,
+                                  color=(0, 0, 0), width=0.5)
+
+    def filler_pages(self, count, label):
+        for number in range(count):
+            self.new_page()
+            self.line(f"{label} (continued) - sheet {number + 1}")
+            rows = [["Particulars", "Invoice number", "Taxable value", "Tax amount"]]
+            rows += [[f"Entry {self.rng.randint(1, 999)}", f"INV/{self.rng.randint(1, 99999):05d}",
+                      amount(self.rng), amount(self.rng, 100_000)] for _ in range(30)]
+            self.table(rows, [190, 110, 100, 100])
+
+
+def gstr1_pdf(rng, pages=1, noise=0.0):
+    """Bytes of a synthetic GSTR-1 return."""
+    header = random_header(rng)
+    doc = fitz.open()
+    writer = PageWriter(doc, rng, noise)
+    writer.line("Form GSTR-1")
+    writer.line("[See rule 59(1)]")
+    writer.line("Details of outward supplies of goods or services")
+    writer.line(f"Financial year {header['financial_year']}")
+    writer.line(f"Tax period {header['month']}")
+    writer.line(f"1. GSTIN {header['gstin']}")
+    writer.line(f"2(a). Legal name of the registered person {header['legal_name']}")
+    writer.line(f"2(b). Trade name, if any {header['legal_name'].split()[0]}")
+    writer.line(f"2(c). ARN {rng.randint(10**14, 10**15 - 1)}")
+    writer.line(f"2(d). ARN date {header['arn_date']}")
+    writer.line("Total Liability (Outward supplies other than Reverse charge) "
+                + " ".join(amount(rng) for _ in range(5)))
+
+    sections = [
+        ("4A", "4A - Taxable outward supplies made to registered persons (other than reverse charge supplies)"),
+        ("4B", "4B - Taxable outward supplies made to registered persons attracting tax on reverse charge"),
+        ("5", "5 - Taxable outward inter-state supplies made to unregistered persons (where invoice value is more than Rs 2.5 lakh)"),
+        ("6A", "6A - Exports"),
+        ("7", "7 - Taxable supplies (Net of debit notes and credit notes) to unregistered persons"),
+    ]
+    for section_id, heading in sections:
+        writer.line(heading)
+        writer.line("Type Count Document type Taxable value Integrated tax Central tax State/UT tax Cess")
+        for _ in range(rng.randint(1, 6)):
+            writer.line(f"{rng.choice(['Regular', 'SEZ', 'Deemed export'])} {rng.randint(1, 40)} Invoice "
+                        + " ".join(amount(rng, 1_000_000) for _ in range(5)))
+        # With noise, some returns are missing a table's totals line
+        if section_id not in ("4A", "4B") or rng.random() >= noise / 2:
+            writer.line(f"Total {rng.randint(1, 500)} Invoice " + " ".join(amount(rng) for _ in range(5)))
+
+    writer.filler_pages(max(0, pages - len(doc)), "Document summary")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def gstr3b_pdf(rng, pages=3, noise=0.0, curves=0.0):
+    """Bytes of a synthetic GSTR-3B return; a fraction `curves` of table cells are ruled with curves."""
+    header = random_header(rng)
+    doc = fitz.open()
+    writer = PageWriter(doc, rng, noise, curves)
+    writer.line("Form GSTR-3B")
+    writer.line("[See rule 61(5)]")
+    writer.line(f"Year {header['financial_year']}")
+    writer.line(f"Period {header['month']}")
+    writer.line(f"1. GSTIN {header['gstin']}")
+    writer.line(f"2(a). Legal name of the registered person {header['legal_name']}")
+    writer.line(f"2(c). ARN {rng.randint(10**14, 10**15 - 1)}")
+    writer.line(f"2(d). Date of ARN {header['arn_date']}")
+
+    writer.line("3.1 Details of Outward supplies and inward supplies liable to reverse charge")
+    writer.table([["Nature of Supplies", "Total Taxable Value", "Integrated Tax", "Central Tax", "State/UT Tax", "Cess"]]
+                 + [[label] + [amount(rng) for _ in range(5)] for label in TABLE_3_1_ROWS],
+                 [190, 70, 65, 65, 65, 55], row_height=22)
+
+    writer.filler_pages(max(0, (pages - 3) // 2), "3.2 Of the supplies shown in 3.1 (a)")
+
+    writer.new_page()
+    writer.line("4. Eligible ITC")
+    writer.table([["Details", "Integrated Tax", "Central Tax", "State/UT Tax", "Cess"]]
+                 + [[label] + (["", "", "", ""] if label[0] in "ABD" and label[1] == "."
+                               else [amount(rng, 1_000_000) for _ in range(4)]) for label in TABLE_4_ROWS],
+                 [250, 70, 70, 70, 55], row_height=22)
+
+    writer.filler_pages(max(0, pages - 3 - (pages - 3) // 2), "Annexure")
+
+    writer.new_page()
+    writer.line("6.1 Payment of tax")
+    writer.table([["Description", "Total Tax Payable", "Tax Paid Through ITC", "Tax Paid in Cash",
+                   "Interest Paid in Cash", "Late Fee Paid in Cash"]]
+                 + [[label] + [amount(rng, 1_000_000) for _ in range(5)] for label in TABLE_6_1_ROWS],
+                 [110, 80, 80, 80, 80, 80], row_height=22)
+    writer.line("Verification: I hereby solemnly affirm and declare that the information given herein above is true.")
+
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def generate_corpus(out_dir, gstr1=10, gstr3b=10, pages=3, noise=0.0, seed=0, curves=0.0):
+    """Write the corpus to out_dir and return the list of written paths."""
+    rng = random.Random(seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for number in range(gstr1):
+        path = out_dir / f"gstr1_{number:05d}.pdf"
+        path.write_bytes(gstr1_pdf(rng, pages=pages, noise=noise))
+        paths.append(path)
+    for number in range(gstr3b):
+        path = out_dir / f"gstr3b_{number:05d}.pdf"
+        path.write_bytes(gstr3b_pdf(rng, pages=pages, noise=noise, curves=curves))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--gstr1", type=int, default=10, help="Number of GSTR-1 returns")
+    parser.add_argument("--gstr3b", type=int, default=10, help="Number of GSTR-3B returns")
+    parser.add_argument("--pages", type=int, default=3, help="Minimum pages per return")
+    parser.add_argument("--noise", type=float, default=0.0, help="0-1: stray lines, jitter, missing 4A/4B totals")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--curves", type=float, default=0.0, help="0-1: GSTR-3B table cells ruled with curves")
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.out_dir, args.gstr1, args.gstr3b, args.pages, args.noise, args.seed, args.curves)
+    print(f"Wrote {len(paths)} PDFs to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Headless batch extraction for directories of GSTR-1 / GSTR-3B PDFs.
+
+Rows are streamed to a CSV or JSONL file as each PDF finishes, so memory use
+does not grow with the size of the batch. Every processed file is recorded in
+a manifest next to the output; re-running the same command skips the files
+that were already extracted successfully. If a run is killed while a file's
+rows are being written, the resumed run first cuts the output back to where
+that file's rows began, so no rows are written twice. Each row's "File Name"
+is the PDF's path relative to the deepest directory holding every input file,
+so same-named returns in different (e.g. per-client) folders stay apart.
+
+Usage:
+    python gst_batch.py returns/ -o returns.csv
+    python gst_batch.py "returns/**/*.pdf" -o returns.jsonl --workers 8
+    python gst_batch.py returns/ -o returns.csv --perf-log timings.jsonl
+    python gst_batch.py returns/ -o returns.csv --memory-budget 512
+    python gst_batch.py returns/ -o returns.csv --table-engine pymupdf
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from gst_extractor import (
+    RECORD_COLUMNS,
+    TABLE_ENGINES,
+    PerformanceLog,
+    default_memory_budget_mb,
+    default_worker_count,
+    detect_return_type,
+    extract_with_timings,
+    pool_context,
+    result_to_records,
+)
+
+
+def find_pdfs(inputs):
+    """Expand directories (recursively) and glob patterns into a sorted list of PDF paths."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.update(Path(item).rglob("*.pdf"))
+            paths.update(Path(item).rglob("*.PDF"))
+        else:
+            paths.update(Path(match) for match in glob.glob(item, recursive=True) if match.lower().endswith(".pdf"))
+    return sorted(str(path.resolve()) for path in paths)
+
+
+def extract_path(path, return_type=None, memory_budget=None, table_engine=None, file_name=None):
+    """
+    Worker entry point: read, classify and extract one PDF into flat records,
+    labelled file_name (default: the path's base name). Returns (return_type,
+    records, size, seconds, stages, peak_memory); with a memory_budget in bytes
+    the PDF is extracted a page at a time within it. GSTR-3B tables are found
+    with table_engine (default: default_table_engine()).
+    """
+    with open(path, "rb") as f:
+        pdf_bytes = f.read()
+    return_type = return_type or detect_return_type(pdf_bytes)
+    if return_type is None:
+        raise ValueError("could not tell whether this is a GSTR-1 or GSTR-3B return")
+    result, seconds, stages, peak_memory = extract_with_timings(return_type, pdf_bytes, memory_budget, table_engine)
+    records = result_to_records(return_type, file_name or os.path.basename(path), result)
+    return return_type, records, len(pdf_bytes), seconds, stages, peak_memory
+
+
+def source_names(paths):
+    """{path: path relative to the deepest directory containing all of paths}."""
+    if not paths:
+        return {}
+    root = os.path.commonpath([os.path.dirname(path) for path in paths])
+    return {path: os.path.relpath(path, root) for path in paths}
+
+
+def manifest_path_for(output_path):
+    return Path(f"{output_path}.manifest.jsonl")
+
+
+def load_manifest(manifest_path):
+    """
+    Return the set of paths already extracted successfully, and the output
+    offset at which the rows of a file that was still being written when the
+    last run stopped begin (None if there is no such file).
+    """
+    done = set()
+    unfinished = None
+    if manifest_path.exists():
+        with open(manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # partially written last line of an interrupted run
+                if entry.get("status") == "writing":
+                    unfinished = entry["offset"]
+                elif entry.get("status") == "ok":
+                    done.add(entry["path"])
+                    unfinished = None
+    return done, unfinished
+
+
+class RecordWriter:
+    """Append-only CSV or JSONL writer that flushes after every file."""
+
+    def __init__(self, output_path, output_format, truncate_at=None):
+        self.output_format = output_format
+        if truncate_at is not None and os.path.exists(output_path):
+            # Rows of a file whose write was interrupted; it is extracted again
+            os.truncate(output_path, truncate_at)
+        is_new = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        self._file = open(output_path, "a", newline="", encoding="utf-8")
+        if output_format == "csv":
+            self._writer = csv.DictWriter(self._file, fieldnames=RECORD_COLUMNS)
+            if is_new:
+                self._writer.writeheader()
+
+    def write(self, records):
+        for record in records:
+            if self.output_format == "csv":
+                self._writer.writerow(record)
+            else:
+                # Amounts are Decimals; written as strings so no precision is lost
+                self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+
+    def tell(self):
+        """Size of the output so far, in bytes."""
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+def run_batch(paths, output_path, output_format, return_type=None, max_workers=None, log=print, performance=None,
+              memory_budget=None, table_engine=None):
+    """
+    Extract every path not yet in the manifest, streaming records to output_path.
+    At most 2 x max_workers files are in flight at once. Stage timings of each
+    extracted file are added to performance (a PerformanceLog), if given. With
+    a memory_budget (bytes per file) files are extracted a page at a time and
+    one that needs more is recorded as failed. GSTR-3B tables are found with
+    table_engine. Rows are labelled with source_names(paths). Returns (ok,
+    failed, skipped).
+    """
+    manifest_path = manifest_path_for(output_path)
+    already_done, unfinished_offset = load_manifest(manifest_path)
+    todo = [path for path in paths if path not in already_done]
+    skipped = len(paths) - len(todo)
+    if skipped:
+        log(f"Skipping {skipped} file(s) already in {manifest_path}")
+
+    # From every path, not just those left to do, so a resumed run labels rows the same way
+    names = source_names(paths)
+    max_workers = max_workers or default_worker_count()
+    writer = RecordWriter(output_path, output_format, truncate_at=unfinished_offset)
+    ok = failed = 0
+    start = time.perf_counter()
+
+    with open(manifest_path, "a", encoding="utf-8") as manifest, \
+            ProcessPoolExecutor(max_workers=max_workers, mp_context=pool_context()) as executor:
+        remaining = iter(todo)
+        in_flight = {}
+
+        def submit_next():
+            path = next(remaining, None)
+            if path is not None:
+                in_flight[executor.submit(extract_path, path, return_type, memory_budget, table_engine,
+                                          names[path])] = path
+
+        for _ in range(max_workers * 2):
+            submit_next()
+
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path = in_flight.pop(future)
+                entry = {"path": path}
+                try:
+                    detected_type, records, size, seconds, stages, peak_memory = future.result()
+                except Exception as exc:
+                    failed += 1
+                    entry.update(status="error", error=f"{type(exc).__name__}: {exc}")
+                    log(f"FAILED {path}: {entry['error']}")
+                else:
+                    # Where the rows start, then the rows, then the "ok" entry: a crash in between
+                    # leaves a "writing" entry, and the next run cuts the output back to its offset
+                    manifest.write(json.dumps({"path": path, "status": "writing", "offset": writer.tell()}) + "\n")
+                    manifest.flush()
+                    writer.write(records)
+                    ok += 1
+                    entry.update(status="ok", return_type=detected_type, rows=len(records))
+                    if peak_memory is not None:
+                        entry["peak_memory"] = peak_memory
+                    if performance is not None:
+                        performance.add_file(path, detected_type, size, seconds, stages, peak_memory=peak_memory)
+                manifest.write(json.dumps(entry) + "\n")
+                manifest.flush()
+
+                done = ok + failed
+                elapsed = time.perf_counter() - start
+                log(f"[{done}/{len(todo)}] {names[path]} ({done / elapsed:.1f} files/sec)")
+                submit_next()
+
+    writer.close()
+    return ok, failed, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="Directories and/or glob patterns of PDF files")
+    parser.add_argument("-o", "--output", required=True, help="Output file (.csv or .jsonl)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Output format (default: from the output extension)")
+    parser.add_argument("--type", choices=["auto", "GSTR-1", "GSTR-3B"], default="auto", help="Return type (default: detect per file)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: GST_MAX_WORKERS or CPU count)")
+    parser.add_argument("--perf-log", help="Append per-file stage timings to this file as JSON lines (default: GST_PERF_LOG)")
+    parser.add_argument("--memory-budget", type=float, default=None,
+                        help="Extract page at a time, failing files that need more than this many MB "
+                             "(default: GST_MEMORY_BUDGET_MB; 0 only measures)")
+    parser.add_argument("--table-engine", choices=TABLE_ENGINES, default=None,
+                        help="Engine that finds GSTR-3B tables (default: GST_TABLE_ENGINE or pdfplumber)")
+    args = parser.parse_args(argv)
+
+    memory_budget_mb = args.memory_budget
+    if memory_budget_mb is None:
+        try:
+            memory_budget_mb = default_memory_budget_mb()
+        except ValueError as exc:
+            parser.error(str(exc))
+
+    output_format = args.format or ("jsonl" if args.output.lower().endswith((".jsonl", ".json")) else "csv")
+    paths = find_pdfs(args.inputs)
+    if not paths:
+        parser.error("no PDF files found")
+
+    ok, failed, skipped = run_batch(
+        paths,
+        args.output,
+        output_format,
+        return_type=None if args.type == "auto" else args.type,
+        max_workers=args.workers,
+        log=lambda message: print(message, file=sys.stderr),
+        performance=PerformanceLog(args.perf_log or os.environ.get("GST_PERF_LOG")),
+        memory_budget=None if memory_budget_mb is None else int(memory_budget_mb * 1e6),
+        table_engine=args.table_engine,
+    )
+    print(f"Extracted {ok} file(s), {failed} failed, {skipped} skipped", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
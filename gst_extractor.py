@@ -0,0 +1,2204 @@
+"""
+PDF extraction functions for GSTR-1 and GSTR-3B returns.
+
+This module has no Streamlit dependency and no import-time side effects, so
+that it can be imported by worker processes, scripts and benchmarks as well as
+by the GST.py app. The PDF backends and pandas are imported lazily, the first
+time a function that needs them runs.
+"""
+import re
+import io
+import os
+import sys
+import time
+import json
+import hashlib
+import importlib
+import pickle
+import sqlite3
+import zipfile
+import threading
+import multiprocessing
+from collections import OrderedDict, defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+from functools import cached_property
+from pathlib import Path
+ 
+class _LazyModule:
+    """Stand-in for a heavy module that is imported on first attribute access."""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+ 
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+ 
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+ 
+fitz = _LazyModule("fitz")  # PyMuPDF
+pdfplumber = _LazyModule("pdfplumber")
+pd = _LazyModule("pandas")
+np = _LazyModule("numpy")
+pa = _LazyModule("pyarrow")
+pc = _LazyModule("pyarrow.compute")
+xlsxwriter = _LazyModule("xlsxwriter")
+ 
+# Instrumentation
+class StageTimer:
+    """
+    Wall time and call count per named stage. Stages may nest; each is charged
+    only its own (exclusive) time, so the stage times of a file add up to the
+    time spent extracting it.
+    """
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self._stack = []  # [stage, time its current slice started]
+ 
+    @contextmanager
+    def stage(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.seconds[parent[0]] += now - parent[1]
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, started = self._stack.pop()
+            self.seconds[name] += now - started
+            self.calls[name] += 1
+            if self._stack:
+                self._stack[-1][1] = now
+ 
+    def merge(self, stages):
+        for name, timing in stages.items():
+            self.seconds[name] += timing["seconds"]
+            self.calls[name] += timing["calls"]
+ 
+    def as_dict(self):
+        return {name: {"seconds": self.seconds[name], "calls": self.calls[name]} for name in self.calls}
+ 
+# Timer that stage() reports to in the current thread or task, if any
+_active_timer = ContextVar("gst_active_timer", default=None)
+ 
+@contextmanager
+def stage(name):
+    """Time a block (or, as a decorator, a function) as the named stage when a timer is active."""
+    timer = _active_timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+ 
+@contextmanager
+def timing(timer):
+    """Make timer the active timer for stage() within the block."""
+    token = _active_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _active_timer.reset(token)
+ 
+class PerformanceLog:
+    """
+    Per-file stage timings reported by extract_files, and timings of the steps
+    run under activate() (combined sheet, exports), kept for display and, if
+    log_path is set, appended to it as JSON lines.
+    """
+    def __init__(self, log_path=None):
+        self.log_path = Path(log_path) if log_path else None
+        self.files = []
+        self.batches = []
+        self.totals = StageTimer()
+ 
+    def _emit(self, record):
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+ 
+    def add_file(self, file_name, return_type, size, seconds, stages, error=None, peak_memory=None):
+        record = {
+            "event": "file", "timestamp": time.time(), "file": file_name, "return_type": return_type,
+            "bytes": size, "seconds": seconds, "stages": stages, "error": error, "peak_memory": peak_memory,
+        }
+        self.files.append(record)
+        self.totals.merge(stages)
+        self._emit(record)
+ 
+    def add_batch(self, return_type, file_count, seconds, first_result_seconds):
+        """A batch of uploads streamed into view: total time and time until its first rows were ready."""
+        record = {
+            "event": "batch", "timestamp": time.time(), "return_type": return_type, "files": file_count,
+            "seconds": seconds, "first_result_seconds": first_result_seconds,
+        }
+        self.batches.append(record)
+        self._emit(record)
+ 
+    @contextmanager
+    def activate(self, event="run"):
+        """Time the stage() blocks run within this block as one record of the given event."""
+        start = time.perf_counter()
+        with timing(StageTimer()) as timer:
+            yield timer
+        if timer.calls:
+            stages = timer.as_dict()
+            self.totals.merge(stages)
+            self._emit({"event": event, "timestamp": time.time(),
+                        "seconds": time.perf_counter() - start, "stages": stages})
+ 
+    def stage_summary(self):
+        """DataFrame of calls and total seconds per stage, slowest first."""
+        total = sum(self.totals.seconds.values()) or 1.0
+        rows = [{"Stage": name, "Calls": self.totals.calls[name], "Seconds": seconds, "Share": seconds / total}
+                for name, seconds in self.totals.seconds.items()]
+        return pd.DataFrame(rows, columns=["Stage", "Calls", "Seconds", "Share"]).sort_values("Seconds", ascending=False)
+ 
+    def slowest_files(self, count=10):
+        """
+        DataFrame of the slowest files, the stage that dominated each and, for
+        files extracted under a memory budget, the peak memory they added (MB).
+        """
+        rows = [{
+            "File Name": record["file"], "Return Type": record["return_type"], "KB": record["bytes"] / 1024,
+            "Seconds": record["seconds"],
+            "Slowest Stage": max(record["stages"], key=lambda name: record["stages"][name]["seconds"], default=""),
+            "Peak MB": record["peak_memory"] / 1e6 if record["peak_memory"] is not None else None,
+        } for record in self.files]
+        frame = pd.DataFrame(rows, columns=["File Name", "Return Type", "KB", "Seconds", "Slowest Stage", "Peak MB"])
+        # Typed even when no file was parsed (e.g. every return came from the store)
+        return frame.astype({"KB": float, "Seconds": float, "Peak MB": float}).nlargest(count, "Seconds")
+ 
+    def peak_memory(self):
+        """Largest peak memory (bytes) of the files extracted under a memory budget, or None."""
+        return max((record["peak_memory"] for record in self.files if record["peak_memory"] is not None), default=None)
+ 
+# Memory Budget
+class MemoryBudgetExceeded(MemoryError):
+    """Raised by check_memory() when an extraction grows past its memory budget."""
+ 
+def current_rss():
+    """
+    Resident memory of this process in bytes, from /proc where available and
+    otherwise the peak so far (getrusage); 0 if neither can be read.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+ 
+class MemoryBudget:
+    """
+    Memory one extraction may add to the process's resident memory as it was
+    when the budget was created. check() records the peak and, if limit_bytes
+    is set, raises MemoryBudgetExceeded once usage is above it. The process's
+    other threads count too, so in-process extraction next to the app is
+    measured less precisely than in a worker process.
+    """
+    def __init__(self, limit_bytes=None):
+        self.limit_bytes = limit_bytes
+        self.baseline = current_rss()
+        self.peak = 0
+ 
+    def check(self, where=""):
+        used = max(current_rss() - self.baseline, 0)
+        self.peak = max(self.peak, used)
+        if self.limit_bytes and used > self.limit_bytes:
+            raise MemoryBudgetExceeded(
+                f"used {used / 1e6:.0f} MB, over the memory budget of {self.limit_bytes / 1e6:.0f} MB{where}")
+ 
+def default_memory_budget_mb():
+    """
+    GST_MEMORY_BUDGET_MB as a number of MB (fractions allowed), or None if it is
+    not set; ValueError if it is set to anything but a non-negative number.
+    """
+    env_value = os.environ.get("GST_MEMORY_BUDGET_MB", "").strip()
+    if not env_value:
+        return None
+    try:
+        budget_mb = float(env_value)
+    except ValueError:
+        budget_mb = None
+    # Also rejects nan and inf
+    if budget_mb is None or not 0 <= budget_mb < float("inf"):
+        raise ValueError(f"GST_MEMORY_BUDGET_MB must be a number of MB, not {env_value!r}")
+    return budget_mb
+ 
+# Budget that check_memory() enforces in the current thread or task, if any
+_active_budget = ContextVar("gst_active_budget", default=None)
+ 
+def check_memory(where=""):
+    """Check the active memory budget, if any; called between pages by the paged extractors."""
+    budget = _active_budget.get()
+    if budget is not None:
+        budget.check(where)
+ 
+@contextmanager
+def enforcing(budget):
+    """Make budget the one check_memory() enforces within the block."""
+    token = _active_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _active_budget.reset(token)
+ 
+# GST State Code Mapping
+GST_STATE_CODES = {
+    "01": "Jammu and Kashmir", "02": "Himachal Pradesh", "03": "Punjab", "04": "Chandigarh",
+    "05": "Uttarakhand", "06": "Haryana", "07": "Delhi", "08": "Rajasthan", "09": "Uttar Pradesh",
+    "10": "Bihar", "11": "Sikkim", "12": "Arunachal Pradesh", "13": "Nagaland", "14": "Manipur",
+    "15": "Mizoram", "16": "Tripura", "17": "Meghalaya", "18": "Assam", "19": "West Bengal",
+    "20": "Jharkhand", "21": "Odisha", "22": "Chhattisgarh", "23": "Madhya Pradesh", "24": "Gujarat",
+    "26": "Dadra and Nagar Haveli and Daman and Diu", "27": "Maharashtra", "29": "Karnataka",
+    "30": "Goa", "31": "Lakshadweep", "32": "Kerala", "33": "Tamil Nadu", "34": "Puducherry",
+    "35": "Andaman and Nicobar Islands", "36": "Telangana", "37": "Andhra Pradesh", "38": "Ladakh",
+    "97": "Other Territory", "99": "Centre Jurisdiction",
+}
+
+# Helper function to get state from GSTIN
+def get_state_from_gstin(gstin):
+    if not gstin or len(gstin) < 2:
+        return "Unknown"
+    state_code = gstin[:2]
+    return GST_STATE_CODES.get(state_code, "Unknown")
+ 
+# GSTR-1 Functions
+# Headings of Tables 4A and 4B; whitespace between words may include line breaks
+GSTR1_TABLE_HEADINGS = {
+    "4A": re.compile(r"4A\s+-\s+Taxable\s+outward\s+supplies\s+made\s+to\s+registered\s+persons"),
+    "4B": re.compile(r"4B\s+-\s+Taxable\s+outward\s+supplies\s+made\s+to\s+registered\s+persons\s+attracting\s+tax\s+on\s+reverse\s+charge"),
+}
+# Start of any GSTR-1 table heading, e.g. "4B - ", "5 - ", "6A - ", which ends the previous table
+GSTR1_NEXT_TABLE_HEADING = re.compile(r"^\s*\d{1,2}[A-Z]?\s*[-\u2013]\s", re.MULTILINE)
+GSTR1_TABLE_TOTAL = re.compile(r"Total\s+(\d+)\s+Invoice\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)")
+GSTR1_TOTAL_LIABILITY = re.compile(r"Total Liability \(Outward supplies other than Reverse charge\)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)")
+ 
+@stage("regex: header")
+def parse_details(text):
+    details = {"GSTIN": "", "State": "", "Legal Name": "", "Month": "", "Financial Year": ""}
+   
+    gstin_match = re.search(r'GSTIN\s*[:\-]?\s*(\d{2}[A-Z0-9]{13})', text)
+    if gstin_match:
+        details["GSTIN"] = gstin_match.group(1)
+        details["State"] = GST_STATE_CODES.get(details["GSTIN"][:2], "Unknown")
+   
+    legal_name_match = re.search(r'Legal name of the registered person\s*[:\-]?\s*(.*)', text)
+    if legal_name_match:
+        details["Legal Name"] = legal_name_match.group(1).strip()
+   
+    month_match = re.search(r'Tax period\s*[:\-]?\s*(\w+)', text)
+    if month_match:
+        details["Month"] = month_match.group(1).strip()
+   
+    fy_match = re.search(r'Financial year\s*[:\-]?\s*(\d{4}-\d{2})', text)
+    if fy_match:
+        details["Financial Year"] = fy_match.group(1).strip()
+   
+    return details
+ 
+@stage("regex: total liability")
+def parse_total_liability(text):
+    match = GSTR1_TOTAL_LIABILITY.search(text)
+   
+    if match:
+        return [match.group(1), match.group(2), match.group(3), match.group(4), match.group(5)]
+    return ["Not Found", "", "", "", ""]
+ 
+@stage("regex: tables 4A/4B")
+def parse_tables_4A_4B(text):
+    tables = {
+        "4A": {
+            "description": "Taxable outward supplies made to registered persons (other than reverse charge supplies)",
+            "title": "B2B Regular",
+            "data": None
+        },
+        "4B": {
+            "description": "Taxable outward supplies made to registered persons attracting tax on reverse charge",
+            "title": "B2B Reverse charge",
+            "data": None
+        }
+    }
+    
+    for table_id in GSTR1_TABLE_HEADINGS:
+        tables[table_id]["data"] = find_table_totals(text, table_id)[0]
+    
+    return tables
+ 
+def find_table_totals(text, table_id):
+    """
+    (totals, heading_match) for Table 4A or 4B in text: the table's totals line
+    as a dict, or None, and the match of its heading, or None if it is not in
+    the text. Only the text between the heading and the next table heading is
+    searched for the totals.
+    """
+    heading_match = GSTR1_TABLE_HEADINGS[table_id].search(text)
+    if not heading_match:
+        return None, None
+   
+    next_heading = GSTR1_NEXT_TABLE_HEADING.search(text, heading_match.end())
+    section_end = next_heading.start() if next_heading else len(text)
+    total_match = GSTR1_TABLE_TOTAL.search(text, heading_match.end(), section_end)
+    if not total_match:
+        return None, heading_match
+    return {
+        "No. of records": total_match.group(1),
+        "Value": total_match.group(2),
+        "Integrated Tax": total_match.group(3),
+        "Central Tax": total_match.group(4),
+        "State/UT Tax": total_match.group(5),
+        "Cess": total_match.group(6)
+    }, heading_match
+ 
+def extract_details(pdf_path):
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            text = page.extract_text()
+            if text:
+                return parse_details(text)
+    return parse_details("")
+ 
+def extract_total_liability(pdf_bytes):
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        text = "\n".join([page.get_text("text") for page in doc])
+    return parse_total_liability(text)
+ 
+def extract_tables_4A_4B(pdf_bytes):
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        text = "\n".join([page.get_text("text") for page in doc])
+    return parse_tables_4A_4B(text)
+ 
+def iter_page_texts(pdf_bytes):
+    """Text of each page of a PDF in turn, checking the memory budget after each."""
+    with stage("open + page text"):
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    with doc:
+        for page_number in range(doc.page_count):
+            with stage("open + page text"):
+                text = doc[page_number].get_text("text")
+            check_memory(f" on page {page_number + 1}")
+            yield text
+ 
+def extract_gstr1_paged(pdf_bytes):
+    """
+    extract_gstr1 reading one page at a time. Of the text read so far only the
+    pages that can still hold a match are kept: from the heading of a Table
+    4A/4B whose totals line and end are not found yet, or else just the last
+    page, so a match that runs over a page break is still found.
+    """
+    first_page_text = None
+    total_liability = None
+    tables = parse_tables_4A_4B("")
+    open_tables = set(GSTR1_TABLE_HEADINGS)
+    kept_pages = []
+   
+    for page_text in iter_page_texts(pdf_bytes):
+        if first_page_text is None and page_text.strip():
+            first_page_text = page_text
+        kept_pages.append(page_text)
+        text = "\n".join(kept_pages)
+       
+        if total_liability is None and GSTR1_TOTAL_LIABILITY.search(text):
+            total_liability = parse_total_liability(text)
+       
+        keep_from = len(text) - len(page_text)
+        for table_id in list(open_tables):
+            totals, heading_match = find_table_totals(text, table_id)
+            if heading_match is None:
+                continue
+            if totals is not None or GSTR1_NEXT_TABLE_HEADING.search(text, heading_match.end()):
+                tables[table_id]["data"] = totals
+                open_tables.discard(table_id)
+            else:
+                keep_from = min(keep_from, heading_match.start())
+       
+        # Drop the pages that end before keep_from
+        while kept_pages and len(kept_pages[0]) < keep_from:
+            keep_from -= len(kept_pages.pop(0)) + 1
+   
+    return {
+        "details": parse_details(first_page_text or ""),
+        "total_liability": total_liability or parse_total_liability(""),
+        "tables_4A_4B": tables,
+    }
+ 
+def extract_gstr1(pdf_bytes):
+    """
+    Single-pass GSTR-1 extraction: the PDF is opened once and each page's text is
+    extracted once. Header fields come from the first page with text, the Total
+    Liability line and Tables 4A/4B from the text of the whole document.
+    """
+    with stage("open + page text"), fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        page_texts = [page.get_text("text") for page in doc]
+   
+    first_page_text = next((text for text in page_texts if text.strip()), "")
+    text = "\n".join(page_texts)
+   
+    return {
+        "details": parse_details(first_page_text),
+        "total_liability": parse_total_liability(text),
+        "tables_4A_4B": parse_tables_4A_4B(text),
+    }
+ 
+# GSTR-3B Functions
+# An amount once commas, E/F markers and surrounding whitespace are stripped, and the
+# common case of one already in whole paise (at most two decimals)
+AMOUNT_PATTERN = r"^-?(\d{1,15}(\.\d{0,12})?|\.\d{1,12})$"
+PAISE_PATTERN = r"^-?(\d{1,15}(\.\d{0,2})?|\.\d{1,2})$"
+ 
+def amount_dtype():
+    """Dtype of amount columns: exact decimals with two places, i.e. whole paise."""
+    return pd.ArrowDtype(pa.decimal128(18, 2))
+ 
+def _amount_strings(values):
+    try:
+        return pa.array(values, type=pa.string(), from_pandas=True)
+    except (TypeError, ValueError):
+        # Numbers or Decimals mixed in with the text
+        strings = pd.Series(values, dtype=object).astype("string")
+        return pa.array(strings.to_numpy(dtype=object, na_value=None), type=pa.string())
+ 
+def parse_amounts(values, invalid_as_zero=True):
+    """
+    Vectorised, exact parse of amounts such as "1,23,456.78" or "1,000.00 E" into
+    a decimal array (see amount_dtype). Commas, E/F markers and whitespace are
+    stripped and the text cast straight to decimals with Arrow kernels, so no value
+    ever goes through a float; more than two decimals round half away from zero.
+    Missing or unparseable values become 0, or missing if invalid_as_zero is False.
+    """
+    text = _amount_strings(values)
+    for marker in (",", "E", "F"):
+        text = pc.replace_substring(text, marker, "")
+    text = pc.utf8_trim_whitespace(text)
+    valid = pc.fill_null(pc.match_substring_regex(text, AMOUNT_PATTERN), False)
+    text = pc.if_else(valid, text, "0")
+   
+    if pc.all(pc.match_substring_regex(text, PAISE_PATTERN)).as_py():
+        amounts = pc.cast(text, pa.decimal128(18, 2))
+    else:
+        wide = pc.cast(text, pa.decimal128(28, 12))
+        amounts = pc.cast(pc.round(wide, 2, round_mode="half_towards_infinity"), pa.decimal128(18, 2))
+    if not invalid_as_zero:
+        amounts = pc.if_else(valid, amounts, pa.scalar(None, amounts.type))
+    return pd.arrays.ArrowExtensionArray(amounts)
+ 
+def parse_amount_columns(frame, columns, invalid_as_zero=True):
+    """
+    Copy of frame with the given columns (those present) parsed by parse_amounts,
+    in one pass over all their cells. Columns that already hold amounts are kept.
+    """
+    dtypes = frame.dtypes
+    columns = [column for column in columns if column in dtypes.index]
+    to_parse = [column for column in columns if dtypes[column] != amount_dtype()]
+    updates = {}
+    if invalid_as_zero:
+        updates.update((column, frame[column].fillna(Decimal(0))) for column in columns if column not in to_parse)
+    # Entirely missing columns (e.g. added by reindex) need no parsing
+    empty = [column for column in to_parse if frame[column].isna().all()]
+    if empty:
+        fill = pa.repeat(pa.scalar(Decimal(0) if invalid_as_zero else None, pa.decimal128(18, 2)), len(frame))
+        updates.update((column, pd.arrays.ArrowExtensionArray(fill)) for column in empty)
+        to_parse = [column for column in to_parse if column not in empty]
+    if to_parse:
+        # Each column's cells are contiguous in the parsed array
+        cells = np.concatenate([frame[column].to_numpy(dtype=object) for column in to_parse])
+        parsed = parse_amounts(cells, invalid_as_zero)
+        rows = len(frame)
+        updates.update((column, parsed[position * rows:(position + 1) * rows]) for position, column in enumerate(to_parse))
+    return frame.assign(**updates)
+ 
+class CachedPage:
+    """
+    Wrapper around a pdfplumber page that computes its text, words and tables
+    lazily and at most once, however many extractors ask for them.
+    """
+    def __init__(self, page):
+        self._page = page
+        self.page_number = page.page_number
+ 
+    @cached_property
+    @stage("page text")
+    def text(self):
+        return self._page.extract_text() or ""
+ 
+    @cached_property
+    @stage("page words")
+    def words(self):
+        return self._page.extract_words()
+ 
+    @cached_property
+    @stage("table detection")
+    def _found_tables(self):
+        return self._page.find_tables()
+ 
+    @cached_property
+    @stage("table extraction")
+    def tables(self):
+        return [table.extract() for table in self._found_tables]
+ 
+    def release(self):
+        """Free pdfplumber's layout of the page, keeping the text and tables already extracted."""
+        self.__dict__.pop("_found_tables", None)
+        self._page.close()
+ 
+    @cached_property
+    def table(self):
+        # Same choice as pdfplumber's extract_table: the table with the most cells, then the topmost
+        if not self._found_tables:
+            return None
+        largest = min(range(len(self._found_tables)),
+                      key=lambda i: (-len(self._found_tables[i].cells), self._found_tables[i].bbox[1], self._found_tables[i].bbox[0]))
+        return self.tables[largest]
+ 
+# PyMuPDF Table Engine
+# pdfplumber's default ("lines") table finder rebuilt on PyMuPDF's vector graphics
+# and words, with the same snapping, joining and intersection rules and tolerances
+TABLE_SNAP_TOLERANCE = 3
+TABLE_JOIN_TOLERANCE = 3
+TABLE_EDGE_MIN_LENGTH = 3
+TABLE_INTERSECTION_TOLERANCE = 3
+TABLE_TEXT_Y_TOLERANCE = 3
+ 
+def ruling_edges(drawings):
+    """
+    Horizontal and vertical edges of the lines, rectangles, quads and curves in
+    PyMuPDF drawings, as two lists of (x0, top, x1, bottom) tuples. As in
+    pdfplumber's curve edges, a Bezier curve counts as the straight line between
+    its end points (control points are ignored); sloped edges are left out.
+    """
+    horizontal, vertical = [], []
+    for drawing in drawings:
+        for item in drawing["items"]:
+            if item[0] == "l":
+                points = [(item[1], item[2])]
+            elif item[0] == "c":
+                points = [(item[1], item[4])]
+            elif item[0] == "re":
+                rect = item[1]
+                points = [(rect.tl, rect.tr), (rect.bl, rect.br), (rect.tl, rect.bl), (rect.tr, rect.br)]
+            elif item[0] == "qu":
+                quad = item[1]
+                points = [(quad.ul, quad.ur), (quad.ll, quad.lr), (quad.ul, quad.ll), (quad.ur, quad.lr)]
+            else:
+                continue
+            for start, end in points:
+                if start.y == end.y and abs(end.x - start.x) >= 1:
+                    horizontal.append((min(start.x, end.x), start.y, max(start.x, end.x), start.y))
+                elif start.x == end.x and abs(end.y - start.y) >= 1:
+                    vertical.append((start.x, min(start.y, end.y), start.x, max(start.y, end.y)))
+    return horizontal, vertical
+ 
+def _merge_edges(edges, position, start, end):
+    # Snap edges whose positions are within the tolerance of each other (chained) to their average...
+    snapped = []
+    edges = sorted(edges, key=lambda edge: edge[position])
+    group = []
+    for edge in edges + [None]:
+        if group and (edge is None or edge[position] > group[-1][position] + TABLE_SNAP_TOLERANCE):
+            average = sum(member[position] for member in group) / len(group)
+            for member in group:
+                moved = list(member)
+                moved[position] = moved[position + 2] = average
+                snapped.append(tuple(moved))
+            group = []
+        if edge is not None:
+            group.append(edge)
+    # ...then join the edges on each line that touch or overlap within the tolerance
+    merged = []
+    snapped.sort(key=lambda edge: (edge[position], edge[start]))
+    for edge in snapped:
+        last = merged[-1] if merged else None
+        if last is not None and last[position] == edge[position] and edge[start] <= last[end] + TABLE_JOIN_TOLERANCE:
+            if edge[end] > last[end]:
+                extended = list(last)
+                extended[end] = edge[end]
+                merged[-1] = tuple(extended)
+        else:
+            merged.append(edge)
+    return [edge for edge in merged if edge[end] - edge[start] >= TABLE_EDGE_MIN_LENGTH]
+ 
+def _intersections_to_cells(intersections):
+    def connects(point, other, axis):
+        return bool(intersections[point][axis] & intersections[other][axis])
+   
+    by_x = defaultdict(list)
+    by_y = defaultdict(list)
+    for point in sorted(intersections):
+        by_x[point[0]].append(point)
+        by_y[point[1]].append(point)
+   
+    cells = []
+    for point in sorted(intersections):
+        # Smallest cell with point as its top left corner, as pdfplumber finds it
+        below = [other for other in by_x[point[0]] if other[1] > point[1]]
+        right = [other for other in by_y[point[1]] if other[0] > point[0]]
+        cell = None
+        for below_point in below:
+            if not connects(point, below_point, "v"):
+                continue
+            for right_point in right:
+                if not connects(point, right_point, "h"):
+                    continue
+                corner = (right_point[0], below_point[1])
+                if corner in intersections and connects(corner, right_point, "v") and connects(corner, below_point, "h"):
+                    cell = (point[0], point[1], corner[0], corner[1])
+                    break
+            if cell:
+                break
+        if cell:
+            cells.append(cell)
+    return cells
+ 
+def _cells_to_tables(cells):
+    # Cells sharing a corner belong to the same table
+    remaining = list(cells)
+    tables = []
+    while remaining:
+        table = [remaining.pop(0)]
+        corners = set()
+        for x0, top, x1, bottom in table:
+            corners.update([(x0, top), (x0, bottom), (x1, top), (x1, bottom)])
+        grown = True
+        while grown:
+            grown = False
+            for cell in list(remaining):
+                x0, top, x1, bottom = cell
+                cell_corners = [(x0, top), (x0, bottom), (x1, top), (x1, bottom)]
+                if any(corner in corners for corner in cell_corners):
+                    corners.update(cell_corners)
+                    table.append(cell)
+                    remaining.remove(cell)
+                    grown = True
+        tables.append(table)
+    tables.sort(key=lambda table: min((cell[1], cell[0]) for cell in table))
+    return [table for table in tables if len(table) > 1]
+ 
+class RuledTable:
+    """A table found by find_ruled_tables, with pdfplumber Table's cells, bbox and extract()."""
+    def __init__(self, cells, words):
+        self.cells = cells
+        self.bbox = (min(cell[0] for cell in cells), min(cell[1] for cell in cells),
+                     max(cell[2] for cell in cells), max(cell[3] for cell in cells))
+        self._words = words
+   
+    def extract(self):
+        """
+        Rows of cell text, top to bottom; "" for an empty cell and None where a
+        merged cell leaves no cell in that column. Words belong to the cell their
+        centre is in; a cell's words are grouped into lines by their tops.
+        """
+        columns = sorted({cell[0] for cell in self.cells})
+        rows = defaultdict(dict)
+        for cell in self.cells:
+            rows[cell[1]][cell[0]] = cell
+        words = [(x0, top, x1, bottom, text, (x0 + x1) / 2, (top + bottom) / 2)
+                 for x0, top, x1, bottom, text in self._words]
+        table = []
+        for row_top in sorted(rows):
+            row = rows[row_top]
+            row_cells = [row.get(column) for column in columns]
+            row_bottom = max(cell[3] for cell in row.values())
+            row_words = [word for word in words if row_top <= word[6] < row_bottom]
+            values = []
+            for cell in row_cells:
+                if cell is None:
+                    values.append(None)
+                    continue
+                x0, top, x1, bottom = cell
+                values.append(_cell_text([word for word in row_words
+                                          if x0 <= word[5] < x1 and top <= word[6] < bottom]))
+            table.append(values)
+        return table
+ 
+def _cell_text(words):
+    lines = []
+    for word in sorted(words, key=lambda word: word[1]):
+        if lines and word[1] <= lines[-1][-1][1] + TABLE_TEXT_Y_TOLERANCE:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    return "\n".join(" ".join(word[4] for word in sorted(line, key=lambda word: word[0])) for line in lines)
+ 
+def find_ruled_tables(drawings, words):
+    """
+    Tables on a page from its PyMuPDF drawings and words ((x0, top, x1, bottom,
+    text) tuples), found the way pdfplumber's find_tables() finds them by
+    default: edges are snapped, joined and intersected, the intersections
+    make up cells, and cells that share corners make up tables (top to
+    bottom). Only the ruling lines are read, so this needs no character layout.
+    """
+    horizontal, vertical = ruling_edges(drawings)
+    horizontal = _merge_edges(horizontal, 1, 0, 2)
+    vertical = _merge_edges(vertical, 0, 1, 3)
+   
+    intersections = {}
+    tolerance = TABLE_INTERSECTION_TOLERANCE
+    for v_edge in sorted(vertical, key=lambda edge: (edge[0], edge[1])):
+        for h_edge in sorted(horizontal, key=lambda edge: (edge[1], edge[0])):
+            if (v_edge[1] <= h_edge[1] + tolerance and v_edge[3] >= h_edge[1] - tolerance
+                    and h_edge[0] - tolerance <= v_edge[0] <= h_edge[2] + tolerance):
+                vertex = intersections.setdefault((v_edge[0], h_edge[1]), {"v": set(), "h": set()})
+                vertex["v"].add(v_edge)
+                vertex["h"].add(h_edge)
+   
+    return [RuledTable(cells, words) for cells in _cells_to_tables(_intersections_to_cells(intersections))]
+ 
+class PyMuPDFPage(CachedPage):
+    """
+    CachedPage backed by PyMuPDF instead of pdfplumber: tables are found by
+    find_ruled_tables from the page's drawings and words, so they come out cell
+    for cell as pdfplumber finds them on ruled returns without laying out every
+    character. The page is only loaded when it is first read.
+    """
+    def __init__(self, doc, page_index):
+        self._doc = doc
+        self.page_number = page_index + 1
+ 
+    @cached_property
+    def _page(self):
+        return self._doc[self.page_number - 1]
+ 
+    @cached_property
+    @stage("page text")
+    def text(self):
+        return self._page.get_text("text")
+ 
+    @cached_property
+    @stage("page words")
+    def _word_boxes(self):
+        return [tuple(word[:5]) for word in self._page.get_text("words")]
+ 
+    @cached_property
+    def words(self):
+        # Same keys as pdfplumber's words
+        return [{"text": text, "x0": x0, "top": top, "x1": x1, "bottom": bottom}
+                for x0, top, x1, bottom, text in self._word_boxes]
+ 
+    @cached_property
+    @stage("table detection")
+    def _found_tables(self):
+        if self._page.rotation:
+            # Drawings are not in the rotated coordinates of the words; PyMuPDF's own finder handles that
+            return self._page.find_tables().tables
+        return find_ruled_tables(self._page.get_drawings(), self._word_boxes)
+ 
+    def release(self):
+        """Drop the loaded page and its table finder, keeping the text and tables already extracted."""
+        self.__dict__.pop("_found_tables", None)
+        self.__dict__.pop("_page", None)
+ 
+# Engines that can lay out GSTR-3B pages and find their tables
+TABLE_ENGINES = ["pdfplumber", "pymupdf"]
+ 
+def default_table_engine():
+    # GST_TABLE_ENGINE overrides the default of pdfplumber
+    engine = os.environ.get("GST_TABLE_ENGINE", "").strip().lower()
+    return engine if engine in TABLE_ENGINES else "pdfplumber"
+ 
+def resolve_table_engine(engine=None):
+    """engine, or the default if None; ValueError if it is not one of TABLE_ENGINES."""
+    engine = engine or default_table_engine()
+    if engine not in TABLE_ENGINES:
+        raise ValueError(f"unknown table engine {engine!r}; expected one of {', '.join(TABLE_ENGINES)}")
+    return engine
+ 
+@stage("section index")
+def build_section_index(pdf_bytes):
+    """
+    Cheap first pass over a GSTR-3B PDF with PyMuPDF's text extraction, mapping
+    each section ("header", "3.1", "4", "6.1") to the 0-based pages that can hold
+    it, using the same markers as the extractors. pdfplumber then only lays out
+    those pages.
+    """
+    index = {"header": [], "3.1": [], "4": [], "6.1": []}
+    table_4_open = None
+    # One page's text at a time
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page_number, page in enumerate(doc):
+            text = " ".join(page.get_text("text").split())
+            if "GSTIN" in text or "Legal name of the registered person" in text or "Date of ARN" in text:
+                index["header"].append(page_number)
+            if "3.1" in text and "Nature of Supplies" in text:
+                index["3.1"].append(page_number)
+            if "Payment of tax" in text:
+                index["6.1"].append(page_number)
+           
+            # Table 4 runs from the Eligible ITC heading up to the page where the next section starts
+            if table_4_open is None and "Eligible ITC" in text:
+                table_4_open = True
+            if table_4_open:
+                index["4"].append(page_number)
+                if "5." in text or "Details of amount paid" in text or "Payment of tax" in text:
+                    table_4_open = False
+    return index
+ 
+# Sections in the order process_gstr3b_file reads them
+GSTR3B_SECTIONS = ["header", "3.1", "4", "6.1"]
+ 
+class CachedDocument:
+    """
+    Per-document collection of CachedPage objects shared by the GSTR-3B extractors,
+    for a pdfplumber PDF or a PyMuPDF document (PyMuPDFPage objects). With
+    release_pages, section_pages() hands out pages one at a time and releases
+    each page's layout as soon as no later section can need it.
+    """
+    def __init__(self, pdf, section_index=None, release_pages=False):
+        if isinstance(pdf, fitz.Document):
+            self.pages = [PyMuPDFPage(pdf, page_index) for page_index in range(pdf.page_count)]
+        else:
+            self.pages = [CachedPage(page) for page in pdf.pages]
+        self._pages_by_number = {page.page_number - 1: page for page in self.pages}
+        self.section_index = section_index or {}
+        self.release_pages = release_pages
+ 
+    @classmethod
+    def wrap(cls, pdf):
+        return pdf if isinstance(pdf, cls) else cls(pdf)
+ 
+    def section_pages(self, section):
+        # Without an index entry for the section, every page remains a candidate
+        page_numbers = self.section_index.get(section)
+        if not page_numbers:
+            pages = self.pages
+        else:
+            pages = [self._pages_by_number[page_number] for page_number in page_numbers
+                     if page_number in self._pages_by_number]
+        return self._released_after_use(section, pages) if self.release_pages else pages
+ 
+    def _released_after_use(self, section, pages):
+        # Sections without index entries scan every page, but only for text, which stays cached
+        later_sections = GSTR3B_SECTIONS[GSTR3B_SECTIONS.index(section) + 1:] if section in GSTR3B_SECTIONS else []
+        needed_later = set()
+        for later in later_sections:
+            needed_later.update(self.section_index.get(later) or [])
+        for page in pages:
+            # Also runs when the extractor stops early and the generator is closed
+            try:
+                yield page
+            finally:
+                if page.page_number - 1 not in needed_later:
+                    page.release()
+                check_memory(f" on page {page.page_number}")
+ 
+    @cached_property
+    def full_text(self):
+        return "\n".join([page.text for page in self.pages if page.text])
+ 
+    @cached_property
+    def header_text(self):
+        return "\n".join([page.text for page in self.section_pages("header") if page.text])
+ 
+@stage("regex: general details")
+def extract_general_details(text):
+    def safe_extract(pattern, text):
+        match = re.search(pattern, text)
+        return match.group(1).strip() if match else None
+   
+    gstin = safe_extract(r"GSTIN\s+([A-Z0-9]+)", text)
+    state = get_state_from_gstin(gstin)
+    
+    return {
+        "GSTIN": gstin,
+        "State": state,
+        "Legal Name": safe_extract(r"Legal name of the registered person\s+(.+)", text),
+        "Date": safe_extract(r"Date of ARN\s+([\d/]+)", text),
+        "Financial Year": safe_extract(r"Year\s+(\d{4}-\d{2})", text),
+        "Period": safe_extract(r"Period\s+([A-Za-z]+)", text),
+    }
+ 
+# Row labels
+def normalize_label(text):
+    """Lowercase with all whitespace (including wrapped line breaks) removed."""
+    return "".join(str(text).split()).lower()
+
+class RowLabelIndex:
+    """
+    The row labels of one GSTR-3B table, normalised once at import. match()
+    classifies a row's first cell with an exact key lookup, falling back to a
+    single regex pass that finds every label (or alias) inside the text and
+    keeps the longest, so "(1) Import of goods" and "(1) As per rules ..." can
+    never shadow each other.
+    """
+    def __init__(self, labels, aliases=None):
+        self.labels = list(labels)
+        self._keys = {normalize_label(label): label for label in self.labels}
+        for alias, label in (aliases or {}).items():
+            self._keys[normalize_label(alias)] = label
+        # Zero-width lookahead, so matches that overlap a shorter one are still seen
+        alternatives = sorted(self._keys, key=len, reverse=True)
+        self._pattern = re.compile("(?=(" + "|".join(map(re.escape, alternatives)) + "))")
+
+    def match(self, text):
+        """The canonical label for text, or None if no label occurs in it."""
+        key = normalize_label(text)
+        label = self._keys.get(key)
+        if label is not None:
+            return label
+        found = max((match.group(1) for match in self._pattern.finditer(key)), key=len, default=None)
+        return self._keys[found] if found else None
+
+TABLE_4_ROWS = RowLabelIndex([
+    "A. ITC Available (whether in full or part)",
+    "(1) Import of goods",
+    "(2) Import of services",
+    "(3) Inward supplies liable to reverse charge",
+    "(4) Inward supplies from ISD",
+    "(5) All other ITC",
+    "B. ITC Reversed",
+    "(1) As per rules 38,42 & 43 of CGST Rules and section 17(5)",
+    "(2) Others",
+    "C. Net ITC available (A-B)",
+    "D. Other Details",
+    "(1) ITC reclaimed which was reversed under Table 4(B)(2) in earlier tax period",
+    "(2) Ineligible ITC under section 16(4) & ITC restricted due to PoS rules"
+])
+
+# Returns abbreviate the 3.1 labels, so the row letter alone also identifies a row
+TABLE_3_1_ROWS = RowLabelIndex([
+    "(a) Outward taxable supplies (other than zero rated, nil rated and exempted)",
+    "(b) Outward taxable supplies (zero rated)",
+    "(c) Other outward supplies (nil rated, exempted)",
+    "(d) Inward supplies (liable to reverse charge)",
+    "(e) Non-GST outward supplies",
+], aliases={"(a)": "(a) Outward taxable supplies (other than zero rated, nil rated and exempted)",
+            "(b)": "(b) Outward taxable supplies (zero rated)",
+            "(c)": "(c) Other outward supplies (nil rated, exempted)",
+            "(d)": "(d) Inward supplies (liable to reverse charge)",
+            "(e)": "(e) Non-GST outward supplies"})
+
+TABLE_6_1_ROWS = RowLabelIndex(["Integrated Tax", "Central Tax", "State/UT Tax", "Cess"])
+
+@stage("table 4")
+def extract_table_4(pdf):
+    value_map = {}
+    table_started = False
+   
+    for page in CachedDocument.wrap(pdf).section_pages("4"):
+        text = page.text
+       
+        if "4. Eligible ITC" in text or "Eligible ITC" in text:
+            table_started = True
+       
+        if table_started:
+            for table in page.tables:
+                if not table:
+                    continue
+               
+                for row in table:
+                    if not row or len(row) < 4:
+                        continue
+                   
+                    row = [str(cell).strip() if cell is not None else '' for cell in row]
+                    row_text = row[0]
+                   
+                    if "Details" in row_text or "Integrated" in row_text:
+                        continue
+                   
+                    # Raw cells; all amounts are parsed together below
+                    values = row[1:5] + [""] * (5 - len(row))
+                   
+                    label = TABLE_4_ROWS.match(row_text)
+                    if label is not None:
+                        value_map[label] = values
+           
+            if "5." in text or "Details of amount paid" in text or "Payment of tax" in text:
+                break
+   
+    data = []
+    for row_header in TABLE_4_ROWS.labels:
+        if row_header in value_map:
+            data.append([row_header] + value_map[row_header])
+        else:
+            data.append([row_header] + [None] * 4)
+   
+    df = pd.DataFrame(data, columns=["Details", "Integrated Tax", "Central Tax", "State/UT Tax", "Cess"])
+    return parse_amount_columns(df, ["Integrated Tax", "Central Tax", "State/UT Tax", "Cess"])
+ 
+@stage("table 3.1")
+def extract_table_3_1(pdf):
+    expected_columns = ["Nature of Supplies", "Total Taxable Value", "Integrated Tax", "Central Tax", "State/UT Tax", "Cess"]
+   
+    for page in CachedDocument.wrap(pdf).section_pages("3.1"):
+        text = page.text
+        if "3.1" in text and "Nature of Supplies" in text:
+            table = page.table
+            if table:
+                df = pd.DataFrame(table[1:], columns=table[0])
+                df = df.iloc[:, :len(expected_columns)]
+                df.columns = expected_columns
+                return parse_amount_columns(df, expected_columns[1:])
+   
+    return parse_amount_columns(pd.DataFrame(columns=expected_columns), expected_columns[1:])
+ 
+@stage("table 6.1")
+def extract_table_6_1(pdf):
+    expected_columns = ["Description", "Total Tax Payable", "Tax Paid Through ITC",
+                       "Tax Paid in Cash", "Interest Paid in Cash", "Late Fee Paid in Cash"]
+   
+    for page in CachedDocument.wrap(pdf).section_pages("6.1"):
+        text = page.text
+        if "Payment of tax" in text:
+            table = page.table
+            if table:
+                df = pd.DataFrame(table[1:], columns=table[0])
+                df = df.iloc[:, :len(expected_columns)]
+                df.columns = expected_columns
+                # Wrapped labels ("Integrated\nTax") read as the standard rows; any others are kept as printed
+                df["Description"] = df["Description"].map(
+                    lambda text: TABLE_6_1_ROWS.match(text) or text if isinstance(text, str) else text)
+                return parse_amount_columns(df, expected_columns[1:])
+   
+    return parse_amount_columns(pd.DataFrame(columns=expected_columns), expected_columns[1:])
+ 
+COMBINED_GENERAL_COLUMNS = ["GSTIN", "State", "Legal Name", "Date", "Financial Year", "Period"]
+COMBINED_AMOUNT_COLUMNS = ["Total Taxable Value", "Integrated Tax", "Central Tax", "State/UT Tax", "Cess",
+                           "Total Tax Payable", "Tax Paid Through ITC", "Tax Paid in Cash",
+                           "Interest Paid in Cash", "Late Fee Paid in Cash"]
+COMBINED_COLUMNS = ["File Name"] + COMBINED_GENERAL_COLUMNS + ["Data Type", "Description"] + COMBINED_AMOUNT_COLUMNS
+ 
+# (Data Type, source table's description column) in the order the sections appear for each file
+COMBINED_SECTIONS = [("Table 3.1", "Nature of Supplies"), ("Table 4", "Details"), ("Table 6.1", "Description")]
+ 
+@stage("combined sheet")
+def create_combined_gstr3b_sheet(general_df, table_3_1_df, table_4_df, table_6_1_df, key_column="File Name"):
+    """
+    Create a single combined sheet with all GSTR-3B data organized systematically:
+    for each file a FILE INFO row, its Table 3.1, 4 and 6.1 rows, and a separator row.
+    Rows are matched to files by key_column, which must be unique per file, while
+    "File Name" is only shown; if general_df has no key_column, its rows are taken
+    to be in the same order as the files. Any other key_column is returned as an
+    extra last column, separators included.
+    """
+    tables = [table_3_1_df, table_4_df, table_6_1_df]
+    identity = list(dict.fromkeys([key_column, "File Name"]))
+   
+    # Files in upload order, then any that only appear in the tables
+    table_files = pd.concat([table.reindex(columns=identity) for table in tables], ignore_index=True)
+    if key_column in general_df.columns:
+        general = general_df.drop_duplicates(key_column)
+        files = pd.concat([general.reindex(columns=identity), table_files], ignore_index=True).drop_duplicates(key_column)
+    else:
+        files = table_files.drop_duplicates(key_column)
+        general = general_df.iloc[:len(files)].assign(**{key_column: files[key_column].iloc[:len(general_df)].to_numpy()})
+    files = files.reset_index(drop=True)
+    file_rank = pd.Series(range(len(files)), index=files[key_column].to_numpy())
+   
+    # Per-file header rows; files without general details are marked "Unknown"
+    info = files.merge(general.reindex(columns=[key_column] + COMBINED_GENERAL_COLUMNS), on=key_column, how="left",
+                       indicator=True)
+    unmatched = info["_merge"] == "left_only"
+    info = info.drop(columns="_merge").astype({column: object for column in COMBINED_GENERAL_COLUMNS})
+    info.loc[unmatched, COMBINED_GENERAL_COLUMNS] = "Unknown"
+   
+    parts = [info.assign(**{"Data Type": "FILE INFO", "Description": "File Information", "_section": 0})]
+    for section, (data_type, description_column) in enumerate(COMBINED_SECTIONS, start=1):
+        table = tables[section - 1]
+        part = table.reindex(columns=identity + [description_column] + COMBINED_AMOUNT_COLUMNS)
+        part = part.rename(columns={description_column: "Description"})
+        # Amount columns the table lacks become exact zeros too
+        part = parse_amount_columns(part, COMBINED_AMOUNT_COLUMNS)
+        part["Description"] = part["Description"].fillna("")
+        part = part.merge(info[[key_column] + COMBINED_GENERAL_COLUMNS], on=key_column, how="left", sort=False)
+        parts.append(part.assign(**{"Data Type": data_type, "_section": section}))
+   
+    combined = pd.concat(parts, ignore_index=True)
+    combined[COMBINED_AMOUNT_COLUMNS] = combined[COMBINED_AMOUNT_COLUMNS].fillna(Decimal(0))
+    combined["_rank"] = combined[key_column].map(file_rank).to_numpy()
+   
+    # Separator after each file: every column blank except the description; amounts
+    # stay decimal columns, with the separators' amounts missing (blank cells on export)
+    separators = pd.DataFrame("", index=range(len(files)), columns=COMBINED_COLUMNS)
+    separators["Description"] = "----------------------"
+    separators[COMBINED_AMOUNT_COLUMNS] = pd.DataFrame(
+        {column: pd.array([None] * len(files), dtype=amount_dtype()) for column in COMBINED_AMOUNT_COLUMNS})
+    separators["_rank"] = range(len(files))
+    separators["_section"] = len(COMBINED_SECTIONS) + 1
+    if key_column not in COMBINED_COLUMNS:
+        separators[key_column] = files[key_column].to_numpy()
+   
+    combined = pd.concat([combined, separators], ignore_index=True)
+    # Stable sort keeps each table's own row order within a file and section
+    combined = combined.sort_values(["_rank", "_section"], kind="stable")
+    columns = COMBINED_COLUMNS if key_column in COMBINED_COLUMNS else COMBINED_COLUMNS + [key_column]
+    return combined[columns].reset_index(drop=True)
+ 
+# Incremental Session Tables
+class SessionTables:
+    """
+    Tables of the files processed in a session, kept up to date incrementally.
+    Files are identified by a key such as their content hash: a file's rows are
+    built once, when its key first appears, and appended to the tables; when
+    the key goes away only its rows are dropped.
+    """
+    def __init__(self):
+        self.keys = []
+        self.tables = {}
+        self._owners = {}  # table name -> key of each row
+        self.version = 0
+ 
+    def sync(self, files, build):
+        """
+        Bring the tables up to date with files, a list of (key, file_name, result);
+        result is only read for keys not yet in the tables, so it may be None for
+        the others. New files are appended in the order given. build(batch) turns a
+        list of (file_name, result) pairs into {table name: DataFrame} with a "_file"
+        column holding each row's position in the batch. Returns True if anything changed.
+        """
+        current = {key for key, _, _ in files}
+        removed = [key for key in self.keys if key not in current]
+        if removed:
+            for name, table in self.tables.items():
+                keep = ~pd.Series(self._owners[name]).isin(removed).to_numpy()
+                self.tables[name] = table[keep].reset_index(drop=True)
+                self._owners[name] = self._owners[name][keep]
+            self.keys = [key for key in self.keys if key in current]
+            self.version += 1
+        return self.append(files, build) or bool(removed)
+ 
+    def append(self, files, build):
+        """
+        Append the rows of the files, (key, file_name, result) triples as for
+        sync(), whose keys are not in the tables yet; rows of other files are
+        left alone. Returns True if anything was added.
+        """
+        known = set(self.keys)
+        added = []
+        for key, file_name, result in files:
+            if key not in known:
+                known.add(key)
+                added.append((key, file_name, result))
+       
+        if added:
+            batch_keys = np.array([key for key, _, _ in added], dtype=object)
+            for name, table in build([(file_name, result) for _, file_name, result in added]).items():
+                owners = batch_keys[table["_file"].to_numpy(dtype=int)]
+                table = table.drop(columns="_file")
+                if name in self.tables and not self.tables[name].empty:
+                    if not table.empty:
+                        self.tables[name] = pd.concat([self.tables[name], table], ignore_index=True)
+                        self._owners[name] = np.concatenate([self._owners[name], owners])
+                else:
+                    self.tables[name] = table.reset_index(drop=True)
+                    self._owners[name] = owners
+            self.keys += [key for key, _, _ in added]
+            self.version += 1
+        return bool(added)
+ 
+    def file_keys(self, name):
+        """Key of the file each row of table name comes from, as an array aligned with the table."""
+        return self._owners[name]
+ 
+    def with_keys(self, name, column="File Key"):
+        """A copy of table name with each row's file key in column."""
+        return self.tables[name].assign(**{column: self._owners[name]})
+ 
+# Filtering
+def build_file_dimension(frame, file_keys, columns):
+    """
+    File-level dimension table: one row per key in file_keys, the key of the file
+    each row of frame comes from (the row position is the file ID). "File Key"
+    identifies the file, "File Name" is kept for display, and the given filter
+    columns are stored as categoricals whose categories keep their order of first
+    appearance.
+    """
+    first = ~pd.Series(file_keys).duplicated().to_numpy()
+    dimension = frame[first].reindex(columns=["File Name"] + columns).reset_index(drop=True)
+    dimension.insert(0, "File Key", np.asarray(file_keys, dtype=object)[first])
+    for column in columns:
+        dimension[column] = pd.Categorical(dimension[column], categories=pd.unique(dimension[column].dropna()))
+    return dimension
+ 
+def select_files(dimension, selections):
+    """
+    Boolean mask over file IDs for {column: selected values}. A selection of None
+    or an empty list does not constrain its column.
+    """
+    mask = pd.Series(True, index=dimension.index).to_numpy()
+    for column, selected in selections.items():
+        if selected:
+            mask = mask & dimension[column].isin(selected).to_numpy()
+    return mask
+ 
+def slice_by_files(fact_df, file_keys, dimension, mask):
+    """
+    Rows of fact_df, whose files' keys are file_keys, that are selected by mask;
+    the frame itself if no row is filtered out.
+    """
+    codes = pd.Index(dimension["File Key"]).get_indexer(file_keys)
+    # Rows whose file is not in the dimension (code -1) are never selected
+    row_mask = (codes >= 0) & mask[codes]
+    if row_mask.all():
+        return fact_df
+    return fact_df[row_mask]
+ 
+# Reconciliation
+# GSTR-3B Table 3.1 rows reconciled against GSTR-1's Total Liability (outward
+# supplies other than reverse charge): taxable outward supplies, zero rated included
+RECONCILED_3_1_ROWS = [
+    "(a) Outward taxable supplies (other than zero rated, nil rated and exempted)",
+    "(b) Outward taxable supplies (zero rated)",
+]
+ 
+# (compared amount, GSTR-1 Total Liability column, GSTR-3B Table 3.1 column)
+RECONCILED_AMOUNTS = [
+    ("Taxable Value", "Taxable Value", "Total Taxable Value"),
+    ("IGST", "IGST", "Integrated Tax"),
+    ("CGST", "CGST", "Central Tax"),
+    ("SGST", "SGST", "State/UT Tax"),
+    ("Cess", "Cess", "Cess"),
+]
+RECONCILIATION_KEYS = ["GSTIN", "Financial Year", "Period"]
+RECONCILIATION_STATUSES = ["Matched", "Mismatch", "Only in GSTR-1", "Only in GSTR-3B", "Incomplete details"]
+FISCAL_MONTHS = ["April", "May", "June", "July", "August", "September", "October", "November",
+                 "December", "January", "February", "March"]
+ 
+def _text_column(frame, column):
+    """frame[column] as trimmed Arrow strings, blank or absent values as nulls."""
+    values = frame[column] if column in frame.columns else pd.Series(None, index=frame.index, dtype=object)
+    text = pc.utf8_trim_whitespace(pa.array(values.astype("string"), from_pandas=True).cast(pa.string()))
+    return pc.if_else(pc.equal(text, ""), pa.scalar(None, pa.string()), text)
+ 
+def _reconciliation_side(frame, period_column, amount_columns, return_type, key_column):
+    """
+    Arrow table of one return type's amounts summed per GSTIN, financial year and
+    period, with the number of returns (distinct values of key_column) behind each
+    sum. Keys are compared trimmed,
+    with GSTINs upper-cased and periods capitalised. Rows missing a key are never
+    summed together: each keeps its own "_row", so it can only come out unmatched.
+    """
+    keys = [pc.utf8_upper(_text_column(frame, "GSTIN")), _text_column(frame, "Financial Year"),
+            pc.utf8_capitalize(_text_column(frame, period_column))]
+    identified = pc.and_(pc.and_(pc.is_valid(keys[0]), pc.is_valid(keys[1])), pc.is_valid(keys[2]))
+    row_ids = pc.if_else(identified, 0, pa.array(np.arange(1, len(frame) + 1, dtype=np.int64)))
+   
+    amounts = parse_amount_columns(frame.reindex(columns=amount_columns), amount_columns, invalid_as_zero=False)
+    table = pa.table({
+        **dict(zip(RECONCILIATION_KEYS, keys)),
+        "_row": row_ids,
+        "_file": _text_column(frame, key_column),
+        "Legal Name": _text_column(frame, "Legal Name"),
+        **{column: pa.array(amounts[column]) for column in amount_columns},
+    })
+    grouped = table.group_by(RECONCILIATION_KEYS + ["_row"]).aggregate(
+        [("_file", "count_distinct"), ("Legal Name", "max")] + [(column, "sum") for column in amount_columns])
+   
+    # Sums come back as decimal128(38, 2); amounts stay in amount_dtype()
+    columns = {key: grouped[key] for key in RECONCILIATION_KEYS + ["_row"]}
+    columns[f"{return_type} Returns"] = grouped["_file_count_distinct"]
+    columns[f"_name {return_type}"] = grouped["Legal Name_max"]
+    for name, gstr1_column, gstr3b_column in RECONCILED_AMOUNTS:
+        column = gstr1_column if return_type == "GSTR-1" else gstr3b_column
+        columns[f"{name} ({return_type})"] = pc.cast(grouped[f"{column}_sum"], pa.decimal128(18, 2))
+    return pa.table(columns)
+ 
+@stage("reconciliation")
+def reconcile_returns(gstr1_liability, gstr3b_details, gstr3b_table_3_1, tolerance=Decimal("1.00"), key_column="File Name"):
+    """
+    Reconcile GSTR-1 Total Liability rows with GSTR-3B Table 3.1 rows (a) and (b)
+    per GSTIN, financial year and period. Each side is summed per key with Arrow
+    kernels and the two are matched in one full outer hash join, so tens of
+    thousands of return pairs take well under a second. Returns one row per key
+    with both sides' amounts, their differences (GSTR-1 minus GSTR-3B) and a
+    Status: "Matched", "Mismatch" (some difference exceeds tolerance rupees),
+    "Only in GSTR-1", "Only in GSTR-3B" or "Incomplete details" (GSTIN, year
+    or period not found in the return). Returns are told apart by key_column,
+    which all three frames must have.
+    """
+    # GSTR-3B amounts per file, with files lacking rows (a) and (b) kept at missing amounts
+    supplies = gstr3b_table_3_1.reindex(columns=[key_column, "Nature of Supplies"]
+                                        + [column for _, _, column in RECONCILED_AMOUNTS])
+    codes, labels = pd.factorize(supplies["Nature of Supplies"])
+    reconciled = np.array([TABLE_3_1_ROWS.match(label) in RECONCILED_3_1_ROWS for label in labels] + [False])
+    supplies = supplies[reconciled[codes]].drop(columns="Nature of Supplies")
+    gstr3b_rows = gstr3b_details.reindex(columns=[key_column, "GSTIN", "Legal Name", "Financial Year", "Period"])
+    gstr3b_rows = gstr3b_rows.drop_duplicates(key_column).merge(supplies, on=key_column, how="left", sort=False)
+   
+    gstr1 = _reconciliation_side(gstr1_liability, "Month", [column for _, column, _ in RECONCILED_AMOUNTS], "GSTR-1",
+                                 key_column)
+    gstr3b = _reconciliation_side(gstr3b_rows, "Period", [column for _, _, column in RECONCILED_AMOUNTS], "GSTR-3B",
+                                  key_column)
+    joined = gstr1.join(gstr3b, keys=RECONCILIATION_KEYS + ["_row"], join_type="full outer")
+   
+    in_gstr1 = pc.is_valid(joined["GSTR-1 Returns"])
+    in_gstr3b = pc.is_valid(joined["GSTR-3B Returns"])
+    in_both = pc.and_(in_gstr1, in_gstr3b)
+    limit = pa.scalar(Decimal(str(tolerance)), pa.decimal128(18, 2))
+    zero = pa.scalar(Decimal(0), pa.decimal128(18, 2))
+   
+    columns = {key: joined[key] for key in RECONCILIATION_KEYS}
+    columns["Legal Name"] = pc.coalesce(joined["_name GSTR-1"], joined["_name GSTR-3B"])
+    columns["GSTR-1 Returns"] = pc.fill_null(joined["GSTR-1 Returns"], 0)
+    columns["GSTR-3B Returns"] = pc.fill_null(joined["GSTR-3B Returns"], 0)
+    mismatch = pa.scalar(False)
+    for name, _, _ in RECONCILED_AMOUNTS:
+        gstr1_amount = joined[f"{name} (GSTR-1)"]
+        gstr3b_amount = joined[f"{name} (GSTR-3B)"]
+        # A return whose amounts were not found counts as zero against the other side
+        difference = pc.subtract(pc.fill_null(gstr1_amount, zero), pc.fill_null(gstr3b_amount, zero))
+        difference = pc.if_else(in_both, pc.cast(difference, pa.decimal128(18, 2)), pa.scalar(None, pa.decimal128(18, 2)))
+        mismatch = pc.or_(mismatch, pc.fill_null(pc.greater(pc.abs(difference), limit), False))
+        columns[f"{name} (GSTR-1)"] = gstr1_amount
+        columns[f"{name} (GSTR-3B)"] = gstr3b_amount
+        columns[f"{name} Difference"] = difference
+   
+    status = pc.if_else(mismatch, "Mismatch", "Matched")
+    status = pc.if_else(in_gstr3b, status, "Only in GSTR-1")
+    status = pc.if_else(in_gstr1, status, "Only in GSTR-3B")
+    identified = pc.and_(pc.and_(pc.is_valid(joined["GSTIN"]), pc.is_valid(joined["Financial Year"])),
+                         pc.is_valid(joined["Period"]))
+    columns["Status"] = pc.if_else(identified, status, "Incomplete details")
+    columns["_month"] = pc.index_in(joined["Period"], value_set=pa.array(FISCAL_MONTHS))
+   
+    table = pa.table(columns).sort_by([("GSTIN", "ascending"), ("Financial Year", "ascending"), ("_month", "ascending")])
+    return table.drop_columns("_month").to_pandas(
+        types_mapper=lambda data_type: pd.ArrowDtype(data_type) if pa.types.is_decimal(data_type) else None)
+ 
+# Summaries and Paging
+SUMMARY_KEYS = ["GSTIN", "Financial Year", "Period"]
+ 
+# Per-file GSTR-3B amounts shown in the summary: (summary column, source table,
+# row labels summed or None for every row, label column, amount columns summed)
+GSTR3B_SUMMARY_AMOUNTS = [
+    ("Taxable Value", "Table 3.1", RECONCILED_3_1_ROWS, "Nature of Supplies", ["Total Taxable Value"]),
+    ("Output Tax", "Table 3.1", RECONCILED_3_1_ROWS, "Nature of Supplies",
+     ["Integrated Tax", "Central Tax", "State/UT Tax", "Cess"]),
+    ("Net ITC", "Table 4", ["C. Net ITC available (A-B)"], "Details",
+     ["Integrated Tax", "Central Tax", "State/UT Tax", "Cess"]),
+    ("Tax Payable", "Table 6.1", TABLE_6_1_ROWS.labels, "Description", ["Total Tax Payable"]),
+    ("Paid Through ITC", "Table 6.1", TABLE_6_1_ROWS.labels, "Description", ["Tax Paid Through ITC"]),
+    ("Paid in Cash", "Table 6.1", TABLE_6_1_ROWS.labels, "Description", ["Tax Paid in Cash"]),
+]
+GSTR3B_SUMMARY_ROWS = {"Table 3.1": TABLE_3_1_ROWS, "Table 4": TABLE_4_ROWS, "Table 6.1": TABLE_6_1_ROWS}
+ 
+def gstr3b_summary_rows(details, tables, key_column="File Name"):
+    """
+    One row per GSTR-3B file: its general details plus the GSTR3B_SUMMARY_AMOUNTS
+    totals taken from tables ({"Table 3.1": ..., "Table 4": ..., "Table 6.1": ...}).
+    Files are told apart by key_column, which all the frames must have. A file
+    without any of a total's rows gets a missing amount, not zero.
+    """
+    identity = list(dict.fromkeys([key_column, "File Name"]))
+    rows = details.drop_duplicates(key_column).reindex(columns=identity + ["GSTIN", "Legal Name"] + SUMMARY_KEYS[1:])
+    zero = pa.scalar(Decimal(0), pa.decimal128(18, 2))
+    for name, table_name, labels, label_column, amount_columns in GSTR3B_SUMMARY_AMOUNTS:
+        table = tables[table_name]
+        if labels is not None:
+            codes, found = pd.factorize(table[label_column])
+            wanted = np.array([GSTR3B_SUMMARY_ROWS[table_name].match(label) in labels for label in found] + [False])
+            table = table[wanted[codes]]
+        amounts = parse_amount_columns(table.reindex(columns=amount_columns), amount_columns, invalid_as_zero=False)
+        total = pa.array(amounts[amount_columns[0]])
+        for column in amount_columns[1:]:
+            total = pc.add(pc.fill_null(total, zero), pc.fill_null(pa.array(amounts[column]), zero))
+        sums = pa.table({key_column: pa.array(table[key_column].astype(object)), name: pc.cast(total, pa.decimal128(18, 2))})
+        sums = sums.group_by(key_column).aggregate([(name, "sum")]).to_pandas(
+            types_mapper=lambda data_type: pd.ArrowDtype(data_type) if pa.types.is_decimal(data_type) else None)
+        rows = rows.merge(sums.rename(columns={f"{name}_sum": name}), on=key_column, how="left", sort=False)
+        rows[name] = rows[name].astype(amount_dtype())
+    return rows
+ 
+@stage("summary")
+def summarize_returns(frame, period_column, amount_columns, key_column="File Name"):
+    """
+    Aggregate of a per-file (or per-row) table for every GSTIN, financial year and
+    period, in fiscal month order: the legal name, the number of returns (distinct
+    values of key_column) and the sum of each amount column. Rows missing a key
+    are summed in a group with that key blank. frame needs key_column, "GSTIN",
+    "Legal Name", "Financial Year" and period_column ("Month" in GSTR-1 tables,
+    "Period" in GSTR-3B ones).
+    """
+    amounts = parse_amount_columns(frame.reindex(columns=amount_columns), amount_columns, invalid_as_zero=False)
+    table = pa.table({
+        "GSTIN": _text_column(frame, "GSTIN"),
+        "Financial Year": _text_column(frame, "Financial Year"),
+        "Period": _text_column(frame, period_column),
+        "_file": _text_column(frame, key_column),
+        "Legal Name": _text_column(frame, "Legal Name"),
+        **{column: pa.array(amounts[column]) for column in amount_columns},
+    })
+    grouped = table.group_by(SUMMARY_KEYS).aggregate(
+        [("Legal Name", "max"), ("_file", "count_distinct")] + [(column, "sum") for column in amount_columns])
+   
+    columns = {key: grouped[key] for key in SUMMARY_KEYS}
+    columns["Legal Name"] = grouped["Legal Name_max"]
+    columns["Returns"] = grouped["_file_count_distinct"]
+    for column in amount_columns:
+        columns[column] = pc.cast(grouped[f"{column}_sum"], pa.decimal128(18, 2))
+    columns["_month"] = pc.index_in(grouped["Period"], value_set=pa.array(FISCAL_MONTHS))
+    summary = pa.table(columns).sort_by([("GSTIN", "ascending"), ("Financial Year", "ascending"),
+                                         ("_month", "ascending"), ("Period", "ascending")])
+    summary = summary.drop_columns("_month").to_pandas(
+        types_mapper=lambda data_type: pd.ArrowDtype(data_type) if pa.types.is_decimal(data_type) else None)
+    return summary.rename(columns={"Period": period_column})
+ 
+def page_count(rows, page_size):
+    """Number of pages of page_size rows needed for rows rows; at least one."""
+    return max(1, -(-rows // page_size))
+ 
+def table_page(frame, page, page_size, sort_by=None, descending=False):
+    """
+    Rows of page (1-based, clamped to the pages there are) of frame sorted by
+    sort_by, or in frame order if None. Only the sort column is ordered and only
+    the page's rows are copied, so a page of a large table stays cheap to send.
+    Missing values sort last either way; ties keep frame order.
+    """
+    page = min(max(page, 1), page_count(len(frame), page_size))
+    start = (page - 1) * page_size
+    if sort_by is None:
+        return frame.iloc[start:start + page_size]
+    order = frame[sort_by].reset_index(drop=True).sort_values(ascending=not descending, kind="stable",
+                                                              na_position="last").index
+    return frame.iloc[order[start:start + page_size]]
+ 
+# Export
+def _excel_cell(value):
+    # Missing values become blank cells; xlsxwriter rejects NaN
+    if value is None or value is pd.NA or (isinstance(value, float) and value != value):
+        return None
+    return value
+ 
+@stage("excel export")
+def write_excel(sheets):
+    """
+    Write {sheet name: DataFrame} to an in-memory .xlsx and return its bytes.
+    xlsxwriter's constant_memory mode flushes each row as soon as the next one
+    starts, so memory stays flat however many rows are exported.
+    """
+    buffer = io.BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {"constant_memory": True})
+    header_format = workbook.add_format({"bold": True})
+    for sheet_name, frame in sheets.items():
+        worksheet = workbook.add_worksheet(sheet_name[:31])  # Excel's sheet name limit
+        worksheet.write_row(0, 0, [str(column) for column in frame.columns], header_format)
+        # constant_memory requires writing row by row, in order
+        for row_number, row in enumerate(frame.itertuples(index=False, name=None), start=1):
+            worksheet.write_row(row_number, 0, [_excel_cell(value) for value in row])
+    workbook.close()
+    return buffer.getvalue()
+ 
+# Amount columns of the GSTR-1 and GSTR-3B tables, stored as decimal128(18, 2) in columnar exports
+EXPORT_AMOUNT_COLUMNS = [
+    "Taxable Value", "IGST", "CGST", "SGST", "Value", "Total Taxable Value", "Integrated Tax",
+    "Central Tax", "State/UT Tax", "Cess", "Total Tax Payable", "Tax Paid Through ITC",
+    "Tax Paid in Cash", "Interest Paid in Cash", "Late Fee Paid in Cash",
+]
+EXPORT_COUNT_COLUMNS = ["No. of records"]
+ 
+# Partition value used for rows with a missing GSTIN, year or period (Hive's convention)
+MISSING_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+ 
+def parse_counts(values):
+    """Record counts such as "1,234" as nullable Int64; anything unparseable becomes missing."""
+    text = pd.Series(values, dtype="string").str.replace(r"[,\s]", "", regex=True)
+    return pd.to_numeric(text, errors="coerce").astype("Int64")
+ 
+def with_export_dtypes(frame):
+    """
+    Copy of frame with amount columns as exact decimals and record counts as
+    nullable Int64; "1,00,000.00"-style strings are parsed and anything
+    unparseable (e.g. "Not Found") becomes missing.
+    """
+    amount_columns = [column for column in frame.columns
+                      if column in EXPORT_AMOUNT_COLUMNS and frame[column].dtype != amount_dtype()]
+    frame = parse_amount_columns(frame, amount_columns, invalid_as_zero=False)
+    for column in frame.columns:
+        if column in EXPORT_COUNT_COLUMNS:
+            frame[column] = parse_counts(frame[column]).to_numpy()
+        elif frame[column].dtype == object:
+            frame[column] = frame[column].astype("string")
+    return frame
+ 
+def with_file_details(table, details_df, columns, key_column="File Name"):
+    """Add the given per-file detail columns (e.g. GSTIN, year, period) to a table, matching files by key_column."""
+    missing = [column for column in columns if column not in table.columns]
+    if not missing:
+        return table
+    details = details_df.drop_duplicates(key_column).reindex(columns=[key_column] + missing)
+    return table.merge(details, on=key_column, how="left", sort=False)
+ 
+def _table_file_name(name):
+    return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_").lower()
+ 
+def _partition_value(value):
+    if value is None or value is pd.NA or (isinstance(value, float) and value != value) or str(value).strip() == "":
+        return MISSING_PARTITION
+    return re.sub(r'[\\/:*?"<>|=]+', "_", str(value).strip())
+ 
+@stage("parquet export")
+def write_parquet_archive(tables):
+    """ZIP of one Parquet file per {name: DataFrame}, with numeric amount columns."""
+    buffer = io.BytesIO()
+    # Parquet pages are already compressed
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name, frame in tables.items():
+            archive.writestr(f"{_table_file_name(name)}.parquet", with_export_dtypes(frame).to_parquet(index=False))
+    return buffer.getvalue()
+ 
+@stage("csv export")
+def write_csv_gzip_archive(tables):
+    """ZIP of one gzip-compressed CSV per {name: DataFrame}."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name, frame in tables.items():
+            csv_bytes = io.BytesIO()
+            with_export_dtypes(frame).to_csv(csv_bytes, index=False, compression="gzip")
+            archive.writestr(f"{_table_file_name(name)}.csv.gz", csv_bytes.getvalue())
+    return buffer.getvalue()
+ 
+@stage("partitioned export")
+def write_partitioned_archive(tables, partition_columns):
+    """
+    ZIP laid out as Hive-style partitions, one Parquet file per partition:
+    <table>/GSTIN=<gstin>/Financial Year=<year>/<period column>=<period>/part-0.parquet
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name, frame in tables.items():
+            frame = with_export_dtypes(frame)
+            if frame.empty:
+                continue
+            keys = frame[partition_columns].astype(object).map(_partition_value)
+            for partition, rows in frame.groupby([keys[column] for column in partition_columns], sort=True):
+                path = "/".join(f"{column}={value}" for column, value in zip(partition_columns, partition))
+                data = rows.drop(columns=partition_columns).to_parquet(index=False)
+                archive.writestr(f"{_table_file_name(name)}/{path}/part-0.parquet", data)
+    return buffer.getvalue()
+ 
+# ZIP Archives
+class ArchiveMember:
+    """
+    A PDF inside a ZIP archive, with the name and getvalue() of an uploaded
+    file. Its bytes are decompressed from the archive each time getvalue() is
+    called and not kept, so an archive of hundreds of returns is never
+    unpacked in memory or on disk.
+    """
+    def __init__(self, archive, info, name):
+        self._archive = archive
+        self._info = info
+        self.name = name
+        self.size = info.file_size
+        self.crc = info.CRC
+ 
+    def getvalue(self):
+        with self._archive.open(self._info) as f:
+            return f.read()
+ 
+def archive_members(source, archive_name=None):
+    """
+    (members, skipped) for a ZIP archive given as a path or binary file object:
+    an ArchiveMember for each PDF in it, named "<archive_name>/<path in archive>"
+    when archive_name is given, and (name, reason) for each other entry that
+    was left out. Folders are ignored. Raises zipfile.BadZipFile if source is
+    not a ZIP archive.
+    """
+    archive = zipfile.ZipFile(source)
+    members = []
+    skipped = []
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        name = f"{archive_name}/{info.filename}" if archive_name else info.filename
+        if info.filename.startswith("__MACOSX/") or Path(info.filename).name.startswith("._"):
+            skipped.append((name, "macOS metadata"))
+        elif not info.filename.lower().endswith(".pdf"):
+            skipped.append((name, "not a PDF"))
+        elif info.flag_bits & 0x1:
+            skipped.append((name, "encrypted"))
+        else:
+            members.append(ArchiveMember(archive, info, name))
+    return members, skipped
+ 
+# Extraction Cache
+# Bump EXTRACTOR_VERSION whenever an extractor changes its output so that
+# previously cached results are not reused.
+EXTRACTOR_VERSION = "8"
+ 
+def content_digest(pdf_bytes):
+    return hashlib.sha256(pdf_bytes).hexdigest()
+ 
+def result_nbytes(value):
+    """Approximate memory held by an extraction result, in bytes."""
+    if isinstance(value, pd.DataFrame):
+        # Arrow-backed columns know their size; only object columns need a deep scan
+        return sum(int(column.memory_usage(index=False, deep=True)) if column.dtype == object else column.array.nbytes
+                   for _, column in value.items())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(result_nbytes(key) + result_nbytes(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(result_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+ 
+class ExtractionCache:
+    """
+    Cache of structured extraction results keyed by the SHA-256 of the PDF bytes
+    and the extractor version. Results live in memory and, if cache_dir is set,
+    are also pickled to disk so they survive a restart.
+   
+    One instance can be shared by every session of a process: lookups and
+    updates are thread-safe, and a caller that misses can claim() the key so
+    that others who miss it meanwhile wait for its result instead of parsing
+    the same PDF again. With max_bytes, the least recently used results are
+    evicted from memory (not from disk) once the results held add up to more
+    than that, as measured by result_nbytes(). stats() reports the hits,
+    misses, waits and evictions so far.
+    """
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self._memory = OrderedDict()  # key -> (result, size), least recently used first
+        self._claims = {}  # key being extracted -> Future of its result
+        self._lock = threading.Lock()
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = self.misses = self.waits = self.evictions = 0
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+ 
+    @staticmethod
+    def make_key(return_type, pdf_bytes, table_engine=None):
+        # GSTR-3B results from other table engines than pdfplumber are kept apart
+        engine = resolve_table_engine(table_engine) if return_type == "GSTR-3B" else "pdfplumber"
+        engine_tag = "" if engine == "pdfplumber" else f"-{engine}"
+        return f"{return_type}-v{EXTRACTOR_VERSION}{engine_tag}-{content_digest(pdf_bytes)}"
+ 
+    def _disk_path(self, key):
+        return self.cache_dir / f"{key}.pkl"
+ 
+    def _remember(self, key, result, size):
+        """Keep result (size bytes) as the most recently used, evicting past max_bytes; lock held."""
+        if key in self._memory:
+            self.nbytes -= self._memory.pop(key)[1]
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # would evict everything else and still not fit
+        self._memory[key] = (result, size)
+        self.nbytes += size
+        while self.max_bytes is not None and self.nbytes > self.max_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self.nbytes -= evicted_size
+            self.evictions += 1
+ 
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key][0]
+        # Read outside the lock so that other sessions are not held up by the disk
+        result = None
+        if self.cache_dir:
+            path = self._disk_path(key)
+            if path.exists():
+                try:
+                    with open(path, "rb") as f:
+                        result = pickle.load(f)
+                except Exception:
+                    result = None
+        size = result_nbytes(result) if result is not None else 0
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(key, result, size)
+        return result
+ 
+    def claim(self, key):
+        """
+        After a miss: None if the caller is now the one to extract key, and must
+        put() or release() it, or a Future that resolves to the result of the
+        caller already extracting it (None if that caller released it instead).
+        """
+        with self._lock:
+            claimed = self._claims.get(key)
+            if claimed is not None:
+                self.waits += 1
+                return claimed
+            self._claims[key] = Future()
+            return None
+ 
+    def release(self, key):
+        """Give up a claim without a result; whoever waits on it gets None."""
+        with self._lock:
+            claimed = self._claims.pop(key, None)
+        if claimed is not None:
+            claimed.set_result(None)
+ 
+    def put(self, key, result):
+        size = result_nbytes(result)
+        with self._lock:
+            self._remember(key, result, size)
+            claimed = self._claims.pop(key, None)
+        if claimed is not None:
+            claimed.set_result(result)
+        if self.cache_dir:
+            # Unique per thread, so sessions storing the same file never share a temporary file
+            tmp_path = self._disk_path(key).with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(result, f)
+            os.replace(tmp_path, self._disk_path(key))
+ 
+    def stats(self):
+        """
+        Entries and bytes held in memory, the budget, and counts of hits, misses,
+        waits (misses served by another caller's claim) and evictions.
+        """
+        with self._lock:
+            return {"entries": len(self._memory), "bytes": self.nbytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "waits": self.waits, "evictions": self.evictions}
+ 
+    def get_or_extract(self, return_type, pdf_bytes, extractor):
+        key = self.make_key(return_type, pdf_bytes)
+        result = self.get(key)
+        if result is None:
+            result = extractor(pdf_bytes)
+            self.put(key, result)
+        return result
+ 
+def process_gstr1_file(pdf_bytes, paged=False):
+    """
+    Extract all GSTR-1 data from a single PDF into a structured result. With
+    paged, the PDF is read a page at a time and only the text that can still
+    hold a match is kept (same result, bounded memory).
+    """
+    return extract_gstr1_paged(pdf_bytes) if paged else extract_gstr1(pdf_bytes)
+ 
+def process_gstr3b_file(pdf_bytes, paged=False, engine=None):
+    """
+    Extract all GSTR-3B data from a single PDF into a structured result. With
+    paged, each page's layout is released as soon as no later table needs it
+    (same result, bounded memory). engine is one of TABLE_ENGINES (default:
+    default_table_engine()); "pymupdf" finds the tables several times faster.
+    """
+    engine = resolve_table_engine(engine)
+    section_index = build_section_index(pdf_bytes)
+    if engine == "pymupdf":
+        # PyMuPDF pages are loaded lazily, so there is no need to pick them up front
+        with stage("pymupdf open"):
+            pdf = fitz.open(stream=pdf_bytes, filetype="pdf")
+    else:
+        pages = None
+        if paged and all(section_index.values()):
+            # Only build page objects for the pages some section is on
+            pages = sorted({page_number + 1 for page_numbers in section_index.values() for page_number in page_numbers})
+        with stage("pdfplumber open"):
+            pdf = pdfplumber.open(io.BytesIO(pdf_bytes), pages=pages)
+    with pdf:
+        # One page model per document so every page is laid out at most once,
+        # and only the pages the section index points at are laid out at all
+        with stage("page tree"):
+            doc = CachedDocument(pdf, section_index, release_pages=paged)
+        return {
+            "general_details": extract_general_details(doc.header_text),
+            "table_3_1": extract_table_3_1(doc),
+            "table_4": extract_table_4(doc),
+            "table_6_1": extract_table_6_1(doc),
+        }
+ 
+EXTRACTORS = {
+    "GSTR-1": process_gstr1_file,
+    "GSTR-3B": process_gstr3b_file,
+}
+ 
+def detect_return_type(pdf_bytes):
+    """Return "GSTR-1" or "GSTR-3B" from the first page of the PDF, or None if neither is recognised."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        text = doc[0].get_text("text") if doc.page_count else ""
+   
+    compact_text = text.replace(" ", "").upper()
+    if "GSTR-3B" in compact_text or "GSTR3B" in compact_text:
+        return "GSTR-3B"
+    if "GSTR-1" in compact_text or "GSTR1" in compact_text:
+        return "GSTR-1"
+    if "Eligible ITC" in text or "Nature of Supplies" in text:
+        return "GSTR-3B"
+    if "Total Liability" in text or "4A - Taxable outward supplies" in text:
+        return "GSTR-1"
+    return None
+ 
+# Flat, return-type independent layout used for streamed (CSV/JSONL) output
+RECORD_COLUMNS = [
+    "File Name", "Return Type", "GSTIN", "State", "Legal Name", "Financial Year", "Period", "Date",
+    "Table", "Description", "No. of records", "Total Taxable Value", "Integrated Tax", "Central Tax",
+    "State/UT Tax", "Cess", "Total Tax Payable", "Tax Paid Through ITC", "Tax Paid in Cash",
+    "Interest Paid in Cash", "Late Fee Paid in Cash",
+]
+ 
+def result_to_records(return_type, file_name, result):
+    """Flatten one file's structured result into RECORD_COLUMNS dicts, one per table row."""
+    records = []
+   
+    def add(header, table, description, values):
+        record = dict.fromkeys(RECORD_COLUMNS, "")
+        record.update(header)
+        record.update(values)
+        record["Table"] = table
+        record["Description"] = description
+        records.append(record)
+   
+    if return_type == "GSTR-1":
+        details = result["details"]
+        header = {
+            "File Name": file_name, "Return Type": return_type, "GSTIN": details["GSTIN"],
+            "State": details["State"], "Legal Name": details["Legal Name"],
+            "Financial Year": details["Financial Year"], "Period": details["Month"],
+        }
+        # The regexes capture amounts as printed; parse them all in one pass
+        amount_columns = ["Total Taxable Value", "Integrated Tax", "Central Tax", "State/UT Tax", "Cess"]
+        rows = [("Total Liability", "Total Liability (Outward supplies other than Reverse charge)", None,
+                 result["total_liability"])]
+        for table_id, table in result["tables_4A_4B"].items():
+            if table["data"]:
+                data = table["data"]
+                rows.append((f"Table {table_id}", table["description"], data["No. of records"],
+                             [data["Value"], data["Integrated Tax"], data["Central Tax"], data["State/UT Tax"], data["Cess"]]))
+        amounts = parse_amounts([value for row in rows for value in row[3]], invalid_as_zero=False)
+        for position, (table, description, count, _) in enumerate(rows):
+            values = {column: amount for column, amount in zip(amount_columns, amounts[position * 5:(position + 1) * 5])
+                      if amount is not pd.NA}
+            if count is not None:
+                values["No. of records"] = int(count.replace(",", ""))
+            add(header, table, description, values)
+        return records
+   
+    general_details = result["general_details"]
+    header = {
+        "File Name": file_name, "Return Type": return_type, "GSTIN": general_details["GSTIN"],
+        "State": general_details["State"], "Legal Name": general_details["Legal Name"],
+        "Financial Year": general_details["Financial Year"], "Period": general_details["Period"],
+        "Date": general_details["Date"],
+    }
+    for table, key, description_column in [("Table 3.1", "table_3_1", "Nature of Supplies"),
+                                           ("Table 4", "table_4", "Details"),
+                                           ("Table 6.1", "table_6_1", "Description")]:
+        for row in result[key].to_dict(orient="records"):
+            description = row.pop(description_column, "")
+            add(header, table, description, row)
+    return records
+ 
+# Upper limit on parse processes, however many CPU cores the host has
+MAX_WORKERS = 64
+ 
+def default_worker_count():
+    # GST_MAX_WORKERS overrides the default of one worker per CPU core; either is capped at MAX_WORKERS
+    env_value = os.environ.get("GST_MAX_WORKERS")
+    if env_value and env_value.isdigit() and int(env_value) > 0:
+        return min(int(env_value), MAX_WORKERS)
+    return min(os.cpu_count() or 1, MAX_WORKERS)
+ 
+# Imported once by the forkserver, so the workers it forks start with them loaded
+WORKER_PRELOAD = ["gst_extractor", "fitz", "pdfplumber", "pandas", "pyarrow.compute"]
+ 
+def pool_context():
+    # Never fork the app's own process: forking the multi-threaded Streamlit server can deadlock on
+    # locks held by its other threads (and macOS defaults to spawn because fork is unsafe there).
+    # Workers only need gst_extractor, so Linux forks them from a clean, preloaded forkserver and
+    # other platforms use their default start method.
+    if sys.platform.startswith("linux"):
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(WORKER_PRELOAD)
+        return context
+    return multiprocessing.get_context()
+ 
+def extract_with_timings(return_type, pdf_bytes, memory_budget=None, table_engine=None):
+    """
+    Run the extractor for return_type under a fresh StageTimer and return
+    (result, seconds, stages, peak_memory). Time not covered by a named stage is
+    charged to "other". With a memory_budget in bytes the file is extracted a
+    page at a time, MemoryBudgetExceeded is raised if it needs more than that
+    (0: no limit), and peak_memory is the most it added to the process's
+    resident memory; otherwise peak_memory is None. table_engine picks the
+    engine GSTR-3B tables are found with (see process_gstr3b_file).
+    """
+    start = time.perf_counter()
+    # GSTR-1 returns have no ruled tables to find; they are always read with PyMuPDF
+    options = {"engine": table_engine} if return_type == "GSTR-3B" else {}
+    if memory_budget is None:
+        with timing(StageTimer()) as timer, timer.stage("other"):
+            result = EXTRACTORS[return_type](pdf_bytes, **options)
+        return result, time.perf_counter() - start, timer.as_dict(), None
+   
+    # Import the backends first, so that the budget only counts the file's own memory
+    for module in (fitz, pdfplumber, pd, pa, pc):
+        module._load()
+    with enforcing(MemoryBudget(memory_budget)) as budget, timing(StageTimer()) as timer, timer.stage("other"):
+        result = EXTRACTORS[return_type](pdf_bytes, paged=True, **options)
+        budget.check()
+    return result, time.perf_counter() - start, timer.as_dict(), budget.peak
+ 
+def iter_extract_files(return_type, files, cache=None, max_workers=None, on_progress=None, performance=None,
+                       memory_budget=None, table_engine=None):
+    """
+    Extract a batch of (file_name, pdf_bytes) pairs, in parallel across a bounded
+    process pool, yielding (index, result, error) for each file as soon as it is
+    done: cached files first, then the rest in completion order. pdf_bytes may
+    also be a function that reads them (e.g. from a ZIP archive); it is called
+    when the file is looked up in the cache and again when it is parsed, and at
+    most two files per worker are read and queued at a time, so a large batch
+    is never all in memory at once. A file that fails (or cannot be read) has
+    result None and an error message, and does not stop the rest of the batch.
+    on_progress(done, total, elapsed_seconds) is called after every file that
+    had to be parsed, and each such file's stage timings are added to
+    performance (a PerformanceLog), if given. With a memory_budget (bytes per
+    file, see extract_with_timings) files are extracted a page at a time and
+    one that needs more fails with MemoryBudgetExceeded. table_engine picks the
+    engine GSTR-3B tables are found with; results are cached per engine.
+    Files that another caller sharing the cache is already extracting are not
+    parsed again: their results are yielded last, once that caller has them.
+    Closing the generator early cancels the files not yet started.
+    """
+    max_workers = max_workers or default_worker_count()
+    table_engine = resolve_table_engine(table_engine)
+    cache_keys = {}
+    sizes = {}
+    pending = []
+    claimed = set()  # cache keys this call must put() or release()
+    borrowed = {}  # Future of a file another caller is extracting -> index
+   
+    def read(index):
+        pdf_bytes = files[index][1]
+        if callable(pdf_bytes):
+            pdf_bytes = pdf_bytes()
+        sizes[index] = len(pdf_bytes)
+        return pdf_bytes
+   
+    def record(index, timed_result, error):
+        result, seconds, stages, peak_memory = timed_result or (None, 0.0, {}, None)
+        if cache and index in cache_keys:
+            key = cache_keys[index]
+            if result is not None:
+                cache.put(key, result)
+            elif key in claimed:
+                cache.release(key)
+            claimed.discard(key)
+        if performance is not None:
+            performance.add_file(files[index][0], return_type, sizes.get(index, 0), seconds, stages, error, peak_memory)
+        return index, result, error
+   
+    def extract_here(index):
+        try:
+            return record(index, extract_with_timings(return_type, read(index), memory_budget, table_engine), None)
+        except Exception as exc:
+            return record(index, None, f"{type(exc).__name__}: {exc}")
+   
+    try:
+        for index in range(len(files)):
+            if not cache:
+                pending.append(index)
+                continue
+            try:
+                cache_keys[index] = cache.make_key(return_type, read(index), table_engine)
+            except Exception as exc:
+                yield index, None, f"{type(exc).__name__}: {exc}"
+                continue
+            result = cache.get(cache_keys[index])
+            if result is not None:
+                yield index, result, None
+                continue
+            in_progress = cache.claim(cache_keys[index])
+            if in_progress is None:
+                claimed.add(cache_keys[index])
+                pending.append(index)
+            else:
+                borrowed[in_progress] = index
+       
+        start = time.perf_counter()
+        total = len(pending)
+       
+        if max_workers == 1 or total <= 1:
+            # Not worth starting worker processes
+            for done, index in enumerate(pending, start=1):
+                outcome = extract_here(index)
+                if on_progress:
+                    on_progress(done, total, time.perf_counter() - start)
+                yield outcome
+        else:
+            with ProcessPoolExecutor(max_workers=min(max_workers, total), mp_context=pool_context()) as executor:
+                remaining = iter(pending)
+                in_flight = {}
+                done = 0
+                try:
+                    while True:
+                        while len(in_flight) < 2 * max_workers:
+                            index = next(remaining, None)
+                            if index is None:
+                                break
+                            try:
+                                future = executor.submit(extract_with_timings, return_type, read(index),
+                                                         memory_budget, table_engine)
+                            except Exception as exc:
+                                # Could not be read; reported like a file that failed to parse
+                                future = Future()
+                                future.set_exception(exc)
+                            in_flight[future] = index
+                        if not in_flight:
+                            break
+                       
+                        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            index = in_flight.pop(future)
+                            try:
+                                outcome = record(index, future.result(), None)
+                            except Exception as exc:
+                                outcome = record(index, None, f"{type(exc).__name__}: {exc}")
+                            done += 1
+                            if on_progress:
+                                on_progress(done, total, time.perf_counter() - start)
+                            yield outcome
+                finally:
+                    # Only wait for the files already running if the consumer stopped early
+                    executor.shutdown(cancel_futures=True)
+       
+        # Files another caller was extracting; parsed here after all if it gave up on them
+        for in_progress in as_completed(borrowed):
+            index = borrowed[in_progress]
+            result = in_progress.result()
+            yield (index, result, None) if result is not None else extract_here(index)
+    finally:
+        # Claims left by a failure or an early close, so that no one waits on them forever
+        for key in claimed:
+            cache.release(key)
+ 
+def extract_files(return_type, files, cache=None, max_workers=None, on_progress=None, performance=None,
+                  memory_budget=None, table_engine=None):
+    """
+    iter_extract_files, collected into a list of (result, error) tuples in the
+    input order.
+    """
+    outcomes = [None] * len(files)
+    for index, result, error in iter_extract_files(return_type, files, cache, max_workers, on_progress, performance,
+                                                   memory_budget, table_engine):
+        outcomes[index] = (result, error)
+    return outcomes
+
+# Return Store
+RETURN_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS returns (
+    return_type TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    extractor_version TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    gstin TEXT,
+    financial_year TEXT,
+    period TEXT,
+    added_at REAL NOT NULL,
+    result BLOB NOT NULL,
+    PRIMARY KEY (return_type, digest)
+);
+CREATE INDEX IF NOT EXISTS returns_by_gstin ON returns (return_type, gstin, financial_year, period);
+CREATE INDEX IF NOT EXISTS returns_by_period ON returns (return_type, financial_year, period);
+"""
+ 
+def _return_identity(return_type, result):
+    """(GSTIN, financial year, period) of an extracted return."""
+    if return_type == "GSTR-1":
+        details = result["details"]
+        return details.get("GSTIN"), details.get("Financial Year"), details.get("Month")
+    details = result["general_details"]
+    return details.get("GSTIN"), details.get("Financial Year"), details.get("Period")
+ 
+class ReturnStore:
+    """
+    Local SQLite store of extracted returns, one row per document keyed by the
+    SHA-256 of its bytes and indexed on GSTIN, financial year and period, so
+    returns uploaded in earlier sessions can be filtered and exported without
+    re-parsing. Rows written by an older EXTRACTOR_VERSION count as not stored.
+    The connection is shared between threads, behind a lock. Returns are
+    identified by content_digest(pdf_bytes), which callers usually have already.
+    """
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(RETURN_STORE_SCHEMA)
+ 
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+ 
+    def contains(self, return_type, digest):
+        rows = self._query(
+            "SELECT 1 FROM returns WHERE return_type = ? AND digest = ? AND extractor_version = ?",
+            (return_type, digest, EXTRACTOR_VERSION),
+        )
+        return bool(rows)
+ 
+    def add(self, return_type, file_name, digest, result):
+        gstin, financial_year, period = _return_identity(return_type, result)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO returns VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (return_type, digest, EXTRACTOR_VERSION, file_name, gstin,
+                 financial_year, period, time.time(), pickle.dumps(result)),
+            )
+ 
+    def count(self, return_type):
+        return self._query(
+            "SELECT COUNT(*) FROM returns WHERE return_type = ? AND extractor_version = ?",
+            (return_type, EXTRACTOR_VERSION),
+        )[0][0]
+ 
+    def financial_years(self, return_type):
+        rows = self._query(
+            "SELECT DISTINCT financial_year FROM returns WHERE return_type = ? AND extractor_version = ? "
+            "ORDER BY financial_year",
+            (return_type, EXTRACTOR_VERSION),
+        )
+        return [row[0] for row in rows]
+ 
+    def keys(self, return_type, gstins=None, financial_years=None, periods=None):
+        """
+        (digest, file name) pairs of the stored returns of return_type, oldest first.
+        gstins, financial_years and periods, if given, restrict the returns to those values.
+        """
+        sql = "SELECT digest, file_name FROM returns WHERE return_type = ? AND extractor_version = ?"
+        parameters = [return_type, EXTRACTOR_VERSION]
+        for column, values in [("gstin", gstins), ("financial_year", financial_years), ("period", periods)]:
+            if values is None:
+                continue
+            values = list(values)
+            conditions = [f"{column} IN ({', '.join('?' * len(values))})"] if values else ["0"]
+            if None in values:
+                conditions.append(f"{column} IS NULL")
+            sql += f" AND ({' OR '.join(conditions)})"
+            parameters += values
+        return self._query(sql + " ORDER BY added_at, rowid", parameters)
+ 
+    def results(self, return_type, digests):
+        """{digest: result} for the given digests that are stored."""
+        results = {}
+        digests = list(digests)
+        for start in range(0, len(digests), 500):  # stay under SQLite's parameter limit
+            chunk = digests[start:start + 500]
+            rows = self._query(
+                f"SELECT digest, result FROM returns WHERE return_type = ? AND extractor_version = ? "
+                f"AND digest IN ({', '.join('?' * len(chunk))})",
+                [return_type, EXTRACTOR_VERSION] + chunk,
+            )
+            results.update((digest, pickle.loads(result)) for digest, result in rows)
+        return results
+ 
+    def load(self, return_type, gstins=None, financial_years=None, periods=None):
+        """(digest, file name, result) triples of the stored returns, filtered as in keys()."""
+        keys = self.keys(return_type, gstins, financial_years, periods)
+        results = self.results(return_type, [digest for digest, _ in keys])
+        return [(digest, file_name, results[digest]) for digest, file_name in keys]
+ 
+    def close(self):
+        with self._lock:
+            self._connection.close()